@@ -1,24 +1,85 @@
 import os
-from datetime import date
-from flask import Flask, request, jsonify, render_template, redirect, url_for, flash
+import io
+import csv
+import json
+import hashlib
+import hmac
+import time
+from datetime import date, timedelta
+from functools import wraps
+from flask import Flask, Response, request, jsonify, render_template, redirect, url_for, flash, stream_with_context, \
+    g, has_request_context
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import event, inspect
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from flask_login import LoginManager, UserMixin, login_user, logout_user, login_required, current_user
 from werkzeug.security import generate_password_hash, check_password_hash
 from flask.cli import with_appcontext
 import click
 
-# Importar los módulos de reconocimiento facial
-from face_recognition.face_capture import capture_faces
-from face_recognition.face_recognizer import train_recognizer, recognize_face
+# Los módulos de reconocimiento facial (cv2, numpy, requests) se importan recién en las rutas y
+# comandos que los usan: los workers web y comandos como init-db arrancan sin cargarlos.
+# face_recognition.metrics solo usa la biblioteca estándar.
+from face_recognition.metrics import REGISTRY, COUNT_BUCKETS
+from jobs import JobManager, RecursoOcupado
+from broadcaster import Broadcaster
 
 app = Flask(__name__)
 app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///students.db'
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 app.config['SECRET_KEY'] = 'your_secret_key_here' # ¡Cambia esto por una clave segura!
+app.config['JOBS_MAX_WORKERS'] = 3 # Hilos para captura, entrenamiento y reconocimiento en segundo plano
+app.config['RECONOCIMIENTO_PIPELINE'] = True # Captura y detección/reconocimiento en hilos separados
+app.config['RECONOCIMIENTO_WORKERS'] = 2 # Hilos de detección/reconocimiento en modo pipeline
+app.config['RECONOCIMIENTO_FUENTES'] = [0] # Índices de cámara, archivos de video o directorios de imágenes
+app.config['RECONOCIMIENTO_VENTANA'] = False # Mostrar la ventana de OpenCV en el servidor; False = sin dibujar nada
+app.config['PREVIEW_MAX_FPS'] = 10 # Tope de frames por segundo de la vista previa MJPEG
+app.config['DETECCION_ESCALA'] = 0.5 # El detector de rostros corre sobre el frame reducido a esta escala
+app.config['DETECCION_INTERVALO'] = 5 # Cada cuántos frames se corre el detector; entre medio se siguen los rostros
+app.config['DETECCION_TAMANO_MINIMO'] = 60 # Lado mínimo de un rostro, en píxeles
+# 'completo': este proceso atiende todo. 'web': las rutas de visión (captura, entrenamiento,
+# reconocimiento, vista previa y trabajos) se reenvían al worker de visión en VISION_URL, un
+# proceso aparte con perfil 'completo' (p. ej. 'flask servir-vision'), y este nunca carga OpenCV.
+app.config['PERFIL'] = os.environ.get('ASISTENCIA_PERFIL', 'completo')
+app.config['VISION_URL'] = os.environ.get('ASISTENCIA_VISION_URL', 'http://127.0.0.1:5001')
+app.config['VISION_TIMEOUT'] = 30 # Segundos sin respuesta del worker de visión antes de devolver 503 (salvo la vista previa)
+# Token que debe mandar el proceso de reconocimiento en X-Registro-Token para usar
+# /asistencias/registrar_lote; sin token, la ruta solo acepta pedidos desde la misma máquina
+app.config['REGISTRO_TOKEN'] = os.environ.get('ASISTENCIA_REGISTRO_TOKEN')
+app.config['REGISTRO_DIAS_ATRAS'] = 7 # Antigüedad máxima de la fecha que acepta /asistencias/registrar_lote
 db = SQLAlchemy(app)
 login_manager = LoginManager()
 login_manager.init_app(app)
 login_manager.login_view = 'login'
+jobs = JobManager(max_workers=app.config['JOBS_MAX_WORKERS'])
+# Asistencias nuevas o modificadas para /asistencias/stream; el canal de cada evento es el curso
+asistencias_eventos = Broadcaster()
+
+# Tamaño de página de /asistencias
+ASISTENCIAS_LIMIT_DEFAULT = 500
+ASISTENCIAS_LIMIT_MAX = 5000
+
+# Tamaño de página y columnas que se pueden pedir en /alumnos
+ALUMNOS_LIMIT_DEFAULT = 500
+ALUMNOS_LIMIT_MAX = 5000
+ALUMNOS_CAMPOS = ('id', 'nombre', 'apellido', 'fecha_nacimiento', 'curso_anio', 'orientacion')
+
+# Estados de asistencia válidos
+ESTADOS_ASISTENCIA = ('Presente', 'Ausente', 'Tarde')
+
+# Días como máximo que se pueden cerrar de una vez con cerrar_dia
+CERRAR_DIA_MAX_DIAS = 366
+
+# Importación masiva de alumnos
+IMPORTACION_LOTE = 500 # Filas por transacción
+IMPORTACION_ERRORES_MAX = 1000 # Errores por fila que se informan; el resto solo se cuenta
+IMPORTACION_FORMATOS = ('csv', 'jsonl')
+
+# Columnas del CSV de exportación de asistencias
+EXPORTACION_COLUMNAS = ('id', 'fecha', 'alumno_id', 'apellido', 'nombre', 'curso_anio', 'estado')
+EXPORTACION_LOTE = 1000 # Filas que se traen de la base por vez
 
 # --- Modelos de la Base de Datos ---
 
@@ -27,7 +88,7 @@ class Alumno(db.Model):
     nombre = db.Column(db.String(100), nullable=False)
     apellido = db.Column(db.String(100), nullable=False)
     fecha_nacimiento = db.Column(db.Date, nullable=True) # Ahora puede ser nulo inicialmente
-    curso_anio = db.Column(db.String(50), nullable=False) # Ej: '1er año CB', '3er año CS - IPP'
+    curso_anio = db.Column(db.String(50), nullable=False, index=True) # Ej: '1er año CB', '3er año CS - IPP'
     orientacion = db.Column(db.String(50), nullable=True) # Ej: 'IPP', 'GAO', 'TEP'. Nullable para ciclo basico
     asistencias = db.relationship('Asistencia', backref='alumno', lazy=True)
 
@@ -42,9 +103,13 @@ class Alumno(db.Model):
         }
 
 class Asistencia(db.Model):
+    # Una sola asistencia por alumno y día; necesario para el upsert de /asistencias/registrar_lote.
+    # Es un índice (y no un UniqueConstraint) para poder agregarlo a bases existentes con 'flask migrar-db'.
+    __table_args__ = (db.Index('uq_asistencia_alumno_fecha', 'alumno_id', 'fecha', unique=True),)
+
     id = db.Column(db.Integer, primary_key=True)
     alumno_id = db.Column(db.Integer, db.ForeignKey('alumno.id'), nullable=False)
-    fecha = db.Column(db.Date, nullable=False, default=date.today)
+    fecha = db.Column(db.Date, nullable=False, default=date.today, index=True)
     estado = db.Column(db.String(50), nullable=False) # Ej: 'Presente', 'Ausente', 'Tarde'
 
     def to_dict(self):
@@ -68,6 +133,345 @@ class Usuario(UserMixin, db.Model):
     def check_password(self, password):
         return check_password_hash(self.password_hash, password)
 
+class TablaVersion(db.Model):
+    # Contador de cambios por tabla; se usa para armar los ETag de los listados
+    __tablename__ = 'tabla_version'
+    tabla = db.Column(db.String(50), primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+
+class ResumenAsistencia(db.Model):
+    # Cantidad de asistencias por curso, día y estado. Se mantiene al registrar asistencias
+    # (ver ajustar_resumen) y se puede reconstruir con 'flask reconstruir-resumen'.
+    __tablename__ = 'resumen_asistencia'
+    curso_anio = db.Column(db.String(50), primary_key=True)
+    fecha = db.Column(db.Date, primary_key=True)
+    estado = db.Column(db.String(50), primary_key=True)
+    cantidad = db.Column(db.Integer, nullable=False, default=0)
+
+class ResumenAsistenciaAlumno(db.Model):
+    # Cantidad acumulada de asistencias por alumno y estado, para el reporte por alumno
+    __tablename__ = 'resumen_asistencia_alumno'
+    alumno_id = db.Column(db.Integer, db.ForeignKey('alumno.id'), primary_key=True)
+    estado = db.Column(db.String(50), primary_key=True)
+    cantidad = db.Column(db.Integer, nullable=False, default=0)
+
+def incrementar_version(conn, tabla):
+    """Incrementa el contador de la tabla dentro de la transacción de conn."""
+    stmt = sqlite_insert(TablaVersion.__table__).values(tabla=tabla, version=1)
+    conn.execute(stmt.on_conflict_do_update(index_elements=['tabla'],
+                                            set_={'version': TablaVersion.__table__.c.version + 1}))
+
+def obtener_version(tabla):
+    return db.session.execute(db.select(TablaVersion.version).where(TablaVersion.tabla == tabla)).scalar() or 0
+
+def ajustar_resumen(conn, deltas, cursos_previos=None):
+    """
+    Aplica a las tablas de resumen los cambios {(alumno_id, fecha, estado): +n/-n} dentro de la
+    transacción de conn. Quien escriba asistencias sin pasar por el ORM debe llamarla.
+
+    cursos_previos ({alumno_id: curso anterior}) son los alumnos que cambiaron de curso en esta
+    transacción: todas sus asistencias pasan del curso anterior al actual, igual que si se
+    reconstruyera el resumen.
+    """
+    deltas = {clave: n for clave, n in deltas.items() if n}
+    cursos_previos = cursos_previos or {}
+    if not deltas and not cursos_previos:
+        return
+    cursos = dict(conn.execute(db.select(Alumno.id, Alumno.curso_anio).where(
+        Alumno.id.in_({alumno_id for alumno_id, _, _ in deltas} | set(cursos_previos)))).all())
+    por_curso = {}
+    por_alumno = {}
+    def sumar(totales, clave, n):
+        totales[clave] = totales.get(clave, 0) + n
+    for (alumno_id, fecha, estado), n in deltas.items():
+        if alumno_id not in cursos:
+            continue
+        sumar(por_alumno, (alumno_id, estado), n)
+        if alumno_id in cursos_previos:
+            # Las asistencias que ya estaban en la base son las actuales menos estos cambios:
+            # se devuelve el cambio al curso anterior, del que abajo se restan las actuales
+            sumar(por_curso, (cursos_previos[alumno_id], fecha, estado), n)
+        else:
+            sumar(por_curso, (cursos[alumno_id], fecha, estado), n)
+    if cursos_previos:
+        actuales = conn.execute(
+            db.select(Asistencia.alumno_id, Asistencia.fecha, Asistencia.estado, db.func.count())
+            .where(Asistencia.alumno_id.in_(cursos_previos))
+            .group_by(Asistencia.alumno_id, Asistencia.fecha, Asistencia.estado))
+        for alumno_id, fecha, estado, n in actuales:
+            if alumno_id in cursos:
+                sumar(por_curso, (cursos_previos[alumno_id], fecha, estado), -n)
+                sumar(por_curso, (cursos[alumno_id], fecha, estado), n)
+    por_curso = {clave: n for clave, n in por_curso.items() if n}
+    por_alumno = {clave: n for clave, n in por_alumno.items() if n}
+
+    for modelo, filas, claves in (
+            (ResumenAsistencia, [{'curso_anio': c, 'fecha': f, 'estado': e, 'cantidad': n}
+                                 for (c, f, e), n in por_curso.items()], ['curso_anio', 'fecha', 'estado']),
+            (ResumenAsistenciaAlumno, [{'alumno_id': a, 'estado': e, 'cantidad': n}
+                                       for (a, e), n in por_alumno.items()], ['alumno_id', 'estado'])):
+        if not filas:
+            continue
+        stmt = sqlite_insert(modelo.__table__)
+        stmt = stmt.on_conflict_do_update(index_elements=claves,
+                                          set_={'cantidad': modelo.__table__.c.cantidad + stmt.excluded.cantidad})
+        conn.execute(stmt, filas)
+
+def _valor_previo(obj, atributo):
+    # Valor que tenía el atributo en la base antes de este flush
+    historial = inspect(obj).attrs[atributo].history
+    return historial.deleted[0] if historial.deleted else getattr(obj, atributo)
+
+@event.listens_for(Session, 'after_flush')
+def _resumir_asistencias(session, flush_context):
+    # Las asistencias escritas por el ORM, y los cambios de curso de los alumnos, actualizan el
+    # resumen en la misma transacción
+    cursos_previos = {}
+    for obj in session.dirty:
+        if isinstance(obj, Alumno):
+            previo = _valor_previo(obj, 'curso_anio')
+            if previo != obj.curso_anio:
+                cursos_previos[obj.id] = previo
+    deltas = {}
+    def sumar(clave, n):
+        deltas[clave] = deltas.get(clave, 0) + n
+    for obj in session.new:
+        if isinstance(obj, Asistencia):
+            sumar((obj.alumno_id, obj.fecha, obj.estado), 1)
+    for obj in session.dirty:
+        if isinstance(obj, Asistencia) and session.is_modified(obj):
+            sumar(tuple(_valor_previo(obj, a) for a in ('alumno_id', 'fecha', 'estado')), -1)
+            sumar((obj.alumno_id, obj.fecha, obj.estado), 1)
+    for obj in session.deleted:
+        if isinstance(obj, Asistencia):
+            sumar(tuple(_valor_previo(obj, a) for a in ('alumno_id', 'fecha', 'estado')), -1)
+    if deltas or cursos_previos:
+        ajustar_resumen(session.connection(), deltas, cursos_previos)
+
+def reconstruir_resumen(conn):
+    """Vuelve a calcular las tablas de resumen a partir de todas las asistencias."""
+    conn.execute(db.delete(ResumenAsistencia.__table__))
+    conn.execute(db.delete(ResumenAsistenciaAlumno.__table__))
+    conn.execute(db.insert(ResumenAsistencia.__table__).from_select(
+        ['curso_anio', 'fecha', 'estado', 'cantidad'],
+        db.select(Alumno.curso_anio, Asistencia.fecha, Asistencia.estado, db.func.count())
+        .join(Alumno, Alumno.id == Asistencia.alumno_id)
+        .group_by(Alumno.curso_anio, Asistencia.fecha, Asistencia.estado)))
+    conn.execute(db.insert(ResumenAsistenciaAlumno.__table__).from_select(
+        ['alumno_id', 'estado', 'cantidad'],
+        db.select(Asistencia.alumno_id, Asistencia.estado, db.func.count())
+        .group_by(Asistencia.alumno_id, Asistencia.estado)))
+
+def cerrar_dia(conn, desde, hasta=None, cursos=None, estado='Ausente'):
+    """
+    Registra `estado` para cada alumno (de `cursos`, o de todos si es None) y cada día entre desde y
+    hasta inclusive que no tenga asistencia. Son un conteo y tres sentencias INSERT ... SELECT
+    (resumen por curso, resumen por alumno y asistencias), sin importar cuántos alumnos haya. Devuelve cuántas
+    asistencias se crearon.
+    """
+    hasta = hasta or desde
+    if hasta < desde:
+        raise ValueError('hasta es anterior a desde')
+    if (hasta - desde).days >= CERRAR_DIA_MAX_DIAS:
+        raise ValueError(f'El rango no puede superar {CERRAR_DIA_MAX_DIAS} días')
+    dias = [date.fromordinal(d) for d in range(desde.toordinal(), hasta.toordinal() + 1)]
+    # Un SELECT por día (SQLite no admite nombres de columna en VALUES); CERRAR_DIA_MAX_DIAS queda
+    # por debajo del límite de 500 SELECT compuestos de SQLite
+    tabla_dias = db.union_all(*[db.select(db.literal(d, db.Date).label('fecha')) for d in dias]).cte('dias')
+    # Pares (alumno, día) sin asistencia
+    faltantes = db.select(Alumno.id.label('alumno_id'), Alumno.curso_anio, tabla_dias.c.fecha) \
+        .join(tabla_dias, db.true()) \
+        .where(~db.exists().where(Asistencia.alumno_id == Alumno.id, Asistencia.fecha == tabla_dias.c.fecha))
+    if cursos is not None:
+        faltantes = faltantes.where(Alumno.curso_anio.in_(cursos))
+    faltantes = faltantes.subquery()
+    # rowcount no es confiable en un INSERT con WITH en SQLite: se cuentan antes
+    creadas = conn.execute(db.select(db.func.count()).select_from(faltantes)).scalar()
+    if not creadas:
+        return 0
+
+    # Primero el resumen: después del INSERT de asistencias ya no se sabe cuáles pares faltaban
+    resumen = ResumenAsistencia.__table__
+    stmt = sqlite_insert(resumen).from_select(
+        ['curso_anio', 'fecha', 'estado', 'cantidad'],
+        db.select(faltantes.c.curso_anio, faltantes.c.fecha, db.literal(estado), db.func.count())
+        .group_by(faltantes.c.curso_anio, faltantes.c.fecha))
+    conn.execute(stmt.on_conflict_do_update(index_elements=['curso_anio', 'fecha', 'estado'],
+                                            set_={'cantidad': resumen.c.cantidad + stmt.excluded.cantidad}))
+    resumen = ResumenAsistenciaAlumno.__table__
+    stmt = sqlite_insert(resumen).from_select(
+        ['alumno_id', 'estado', 'cantidad'],
+        db.select(faltantes.c.alumno_id, db.literal(estado), db.func.count()).group_by(faltantes.c.alumno_id))
+    conn.execute(stmt.on_conflict_do_update(index_elements=['alumno_id', 'estado'],
+                                            set_={'cantidad': resumen.c.cantidad + stmt.excluded.cantidad}))
+    conn.execute(db.insert(Asistencia.__table__).from_select(
+        ['alumno_id', 'fecha', 'estado'],
+        db.select(faltantes.c.alumno_id, faltantes.c.fecha, db.literal(estado))))
+    return creadas
+
+def leer_filas(lineas, formato):
+    """
+    Genera (número de fila, dict) a partir de un iterable de líneas de texto en CSV (con
+    encabezado) o JSON lines, sin leer todo el archivo. Una fila ilegible da (número, ValueError).
+    """
+    if formato == 'csv':
+        lector = csv.DictReader(lineas)
+        for fila in lector:
+            # line_num cuenta líneas físicas: es el número que ve quien abre el archivo
+            yield lector.line_num, fila
+        return
+    for numero, linea in enumerate(lineas, start=1):
+        if not linea.strip():
+            continue
+        try:
+            fila = json.loads(linea)
+        except ValueError as e:
+            yield numero, ValueError(f'JSON inválido: {e}')
+            continue
+        yield numero, fila if isinstance(fila, dict) else ValueError('Se espera un objeto JSON por línea')
+
+def _validar_alumno(fila):
+    if isinstance(fila, Exception):
+        raise fila
+    datos = {}
+    for campo in ('nombre', 'apellido', 'curso_anio'):
+        valor = str(fila.get(campo) or '').strip()
+        if not valor:
+            raise ValueError(f"Falta '{campo}'")
+        datos[campo] = valor
+    fecha_nacimiento = str(fila.get('fecha_nacimiento') or '').strip()
+    datos['fecha_nacimiento'] = date.fromisoformat(fecha_nacimiento) if fecha_nacimiento else None
+    datos['orientacion'] = str(fila.get('orientacion') or '').strip() or None
+    return datos
+
+def importar_alumnos(filas, lote=IMPORTACION_LOTE):
+    """
+    Da de alta alumnos a partir de las filas de leer_filas(), de a `lote` por transacción con un
+    solo INSERT (executemany). Las filas inválidas se saltean y se informan; si la lectura se corta
+    (archivo ilegible), los lotes anteriores ya quedaron guardados. Devuelve
+    {'importados', 'con_error', 'errores': [{'fila', 'error'}, ...]}.
+    """
+    resultado = {'importados': 0, 'con_error': 0, 'errores': []}
+    pendientes = []
+
+    def insertar():
+        conn = db.session.connection()
+        conn.execute(db.insert(Alumno.__table__), pendientes)
+        # El INSERT no pasa por el ORM: el ETag de /alumnos se invalida a mano
+        incrementar_version(conn, Alumno.__tablename__)
+        db.session.commit()
+        resultado['importados'] += len(pendientes)
+        pendientes.clear()
+
+    for numero, fila in filas:
+        try:
+            pendientes.append(_validar_alumno(fila))
+        except ValueError as e:
+            resultado['con_error'] += 1
+            if len(resultado['errores']) < IMPORTACION_ERRORES_MAX:
+                resultado['errores'].append({'fila': numero, 'error': str(e)})
+            continue
+        if len(pendientes) >= lote:
+            insertar()
+    if pendientes:
+        insertar()
+    return resultado
+
+class _Linea:
+    # Destino para csv.writer que devuelve lo escrito en lugar de guardarlo
+    def write(self, texto):
+        return texto
+
+def exportar_asistencias_csv(desde=None, hasta=None, cursos=None):
+    """
+    Genera el CSV de asistencias (con alumno y curso) línea por línea, ordenado por fecha, curso y
+    apellido. Las filas se traen de la base de a EXPORTACION_LOTE, así que la memoria no crece con
+    el rango pedido.
+    """
+    query = db.select(Asistencia.id, Asistencia.fecha, Asistencia.alumno_id, Alumno.apellido, Alumno.nombre,
+                      Alumno.curso_anio, Asistencia.estado) \
+        .join(Alumno, Alumno.id == Asistencia.alumno_id)
+    if desde:
+        query = query.where(Asistencia.fecha >= desde)
+    if hasta:
+        query = query.where(Asistencia.fecha <= hasta)
+    if cursos is not None:
+        query = query.where(Alumno.curso_anio.in_(cursos))
+    query = query.order_by(Asistencia.fecha, Alumno.curso_anio, Alumno.apellido, Alumno.nombre, Asistencia.id)
+
+    escritor = csv.writer(_Linea())
+    yield escritor.writerow(EXPORTACION_COLUMNAS)
+    for fila in db.session.execute(query.execution_options(yield_per=EXPORTACION_LOTE)):
+        yield escritor.writerow([v.isoformat() if isinstance(v, date) else v for v in fila])
+
+@event.listens_for(Session, 'after_flush')
+def _versionar_tablas(session, flush_context):
+    # Cualquier alta, baja o modificación de alumnos por el ORM invalida el ETag de /alumnos
+    if any(isinstance(obj, Alumno) for obj in (*session.new, *session.dirty, *session.deleted)):
+        incrementar_version(session.connection(), Alumno.__tablename__)
+
+# --- Métricas ---
+
+HTTP_SECONDS = REGISTRY.histogram('http_request_segundos', 'Duración de los requests por ruta.',
+                                  ('ruta', 'metodo', 'estado'))
+SQL_QUERIES_PER_REQUEST = REGISTRY.histogram('sql_consultas_por_request', 'Consultas SQL ejecutadas por request.',
+                                             ('ruta',), buckets=COUNT_BUCKETS)
+SQL_SECONDS_PER_REQUEST = REGISTRY.histogram('sql_segundos_por_request', 'Tiempo total en SQL por request.', ('ruta',))
+SQL_QUERY_SECONDS = REGISTRY.histogram('sql_consulta_segundos', 'Duración de cada consulta SQL.', ('operacion',))
+
+@app.before_request
+def _iniciar_metricas():
+    g.metricas = {'inicio': time.perf_counter(), 'consultas': 0, 'sql_segundos': 0.0}
+
+@app.after_request
+def _registrar_metricas(response):
+    metricas = g.get('metricas')
+    if metricas is None:
+        return response
+    # La regla ('/alumnos/<int:id>') y no la URL, para no crear una serie por cada id
+    ruta = request.url_rule.rule if request.url_rule else 'sin_ruta'
+    metodo, estado = request.method, response.status_code
+
+    def registrar():
+        HTTP_SECONDS.observe(time.perf_counter() - metricas['inicio'], ruta=ruta, metodo=metodo, estado=estado)
+        SQL_QUERIES_PER_REQUEST.observe(metricas['consultas'], ruta=ruta)
+        SQL_SECONDS_PER_REQUEST.observe(metricas['sql_segundos'], ruta=ruta)
+
+    if response.is_streamed:
+        # Los listados que se generan mientras se envían se miden hasta terminar el envío
+        response.call_on_close(registrar)
+    else:
+        registrar()
+    return response
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def _iniciar_consulta(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('metricas_inicio', []).append(time.perf_counter())
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def _registrar_consulta(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info['metricas_inicio'].pop()
+    SQL_QUERY_SECONDS.observe(elapsed, operacion=statement.split(None, 1)[0].upper())
+    if has_request_context() and 'metricas' in g:
+        g.metricas['consultas'] += 1
+        g.metricas['sql_segundos'] += elapsed
+
+@event.listens_for(Engine, 'handle_error')
+def _descartar_consulta(exception_context):
+    # Una consulta que falla no pasa por after_cursor_execute
+    conn = exception_context.connection
+    if conn is not None and conn.info.get('metricas_inicio'):
+        conn.info['metricas_inicio'].pop()
+
+@app.route('/metrics', methods=['GET'])
+def metricas():
+    """
+    Métricas del proceso en el formato de texto de Prometheus: latencia por ruta, consultas SQL por
+    request, etapas del reconocimiento, envío de asistencias, entrenamiento y modelo.
+    No requiere autenticación, para que la pueda leer Prometheus.
+    """
+    return Response(REGISTRY.render(), mimetype='text/plain; version=0.0.4; charset=utf-8')
+
 @login_manager.user_loader
 def load_user(user_id):
     return Usuario.query.get(int(user_id))
@@ -126,13 +530,44 @@ def gestionar_alumnos():
             db.session.rollback()
             return jsonify({'error': str(e)}), 400
     else: # GET
-        # Si es preceptor, filtrar alumnos por sus cursos
-        if current_user.rol == 'preceptor':
-            cursos_preceptor = current_user.cursos_a_cargo.split(',')
-            alumnos = Alumno.query.filter(Alumno.curso_anio.in_(cursos_preceptor)).all()
-        else: # Admin, ver todos los alumnos (sin fecha_nacimiento ni orientacion si no han sido rellenados)
-            alumnos = Alumno.query.all()
-        return jsonify([a.to_dict() for a in alumnos])
+        # Paginado por clave ('limit' y 'cursor') y con columnas a elección ('campos=id,nombre,...').
+        # La respuesta es {"alumnos": [...], "siguiente": <cursor o null>} y lleva un ETag que cambia
+        # solo cuando cambia la tabla de alumnos, así los listados sin cambios se responden con 304.
+        campos = request.args.get('campos')
+        campos = campos.split(',') if campos else list(ALUMNOS_CAMPOS)
+        if not set(campos) <= set(ALUMNOS_CAMPOS):
+            return jsonify({'error': f'Campos inválidos. Permitidos: {", ".join(ALUMNOS_CAMPOS)}'}), 400
+        if 'id' not in campos:
+            campos.insert(0, 'id') # El id hace falta para el cursor
+        try:
+            limit = min(max(int(request.args.get('limit', ALUMNOS_LIMIT_DEFAULT)), 1), ALUMNOS_LIMIT_MAX)
+            cursor = int(request.args['cursor']) if request.args.get('cursor') else None
+        except ValueError as e:
+            return jsonify({'error': f'Parámetros inválidos: {str(e)}'}), 400
+
+        clave = f"{obtener_version(Alumno.__tablename__)}|{current_user.rol}|{current_user.cursos_a_cargo}|{request.query_string.decode()}"
+        etag = hashlib.sha1(clave.encode()).hexdigest()
+        if request.if_none_match.contains(etag):
+            response = Response(status=304)
+        else:
+            query = db.select(*[getattr(Alumno, c) for c in campos])
+            # Si es preceptor, filtrar alumnos por sus cursos
+            if current_user.rol == 'preceptor':
+                cursos_preceptor = current_user.cursos_a_cargo.split(',')
+                query = query.where(Alumno.curso_anio.in_(cursos_preceptor))
+            # Admin, ver todos los alumnos (sin fecha_nacimiento ni orientacion si no han sido rellenados)
+            if cursor is not None:
+                query = query.where(Alumno.id > cursor)
+            # Se pide una fila de más para saber si hay otra página
+            rows = db.session.execute(query.order_by(Alumno.id).limit(limit + 1)).all()
+            alumnos = [{c: (v.isoformat() if isinstance(v, date) else v) for c, v in zip(campos, row)}
+                       for row in rows[:limit]]
+            siguiente = alumnos[-1]['id'] if len(rows) > limit else None
+            response = jsonify({'alumnos': alumnos, 'siguiente': siguiente})
+        response.set_etag(etag)
+        # El navegador puede guardar la respuesta pero debe revalidarla siempre
+        response.headers['Cache-Control'] = 'private, no-cache'
+        return response
 
 @app.route('/alumnos/<int:id>', methods=['GET', 'PUT', 'DELETE'])
 @login_required
@@ -168,6 +603,7 @@ def alumno_detalle(id):
         # Dejamos la restricción de admin en el frontend.
         if current_user.rol == 'admin':
             data = request.get_json()
+            curso_previo = alumno.curso_anio
             try:
                 alumno.nombre = data.get('nombre', alumno.nombre)
                 alumno.apellido = data.get('apellido', alumno.apellido)
@@ -181,10 +617,14 @@ def alumno_detalle(id):
                     alumno.orientacion = data['orientacion']
                 
                 db.session.commit()
-                return jsonify(alumno.to_dict())
             except Exception as e:
                 db.session.rollback()
                 return jsonify({'error': str(e)}), 400
+            if alumno.curso_anio != curso_previo:
+                # Sus asistencias cambian de curso: los listados de ambos cursos se recargan
+                for curso in (curso_previo, alumno.curso_anio):
+                    asistencias_eventos.publish('recargar', {}, canal=curso)
+            return jsonify(alumno.to_dict())
         else:
             return jsonify({'error': 'No autorizado'}), 403
 
@@ -195,22 +635,121 @@ def alumno_detalle(id):
         db.session.commit()
         return jsonify({'mensaje': 'Alumno eliminado'}), 204
 
+@app.route('/alumnos/importar', methods=['POST'])
+@login_required
+def importar_alumnos_api():
+    """
+    Alta masiva de alumnos (Admin solo). El cuerpo es un CSV con encabezado o JSON lines con
+    nombre, apellido, curso_anio y opcionalmente fecha_nacimiento y orientacion; se lee a medida
+    que llega. El formato se toma de ?formato=csv|jsonl o, si no, del Content-Type.
+    """
+    if current_user.rol != 'admin':
+        return jsonify({'error': 'No autorizado'}), 403
+    formato = request.args.get('formato') or ('jsonl' if 'json' in (request.mimetype or '') else 'csv')
+    if formato not in IMPORTACION_FORMATOS:
+        return jsonify({'error': f'Formato inválido. Permitidos: {", ".join(IMPORTACION_FORMATOS)}'}), 400
+    lineas = io.TextIOWrapper(request.stream, encoding='utf-8-sig', newline='')
+    try:
+        resultado = importar_alumnos(leer_filas(lineas, formato))
+    except (UnicodeDecodeError, csv.Error) as e:
+        db.session.rollback()
+        return jsonify({'error': f'Archivo ilegible: {str(e)}'}), 400
+    return jsonify(resultado), 200
+
 # --- Rutas de Gestión de Asistencia ---
 
+def publicar_asistencia(id, alumno_id, fecha, estado, curso):
+    # Se llama después del commit: los clientes solo ven asistencias ya guardadas
+    asistencias_eventos.publish('asistencia', {'id': id, 'alumno_id': alumno_id, 'fecha': fecha.isoformat(),
+                                               'estado': estado}, canal=curso)
+
 @app.route('/asistencias', methods=['GET']) # Solo GET, no POST manual
 @login_required
 def gestionar_asistencias():
+    """
+    Listado de asistencias de los cursos del preceptor, de la más reciente a la más antigua.
+    Filtros opcionales: desde, hasta (YYYY-MM-DD) y curso. Se pagina por clave con 'limit' y 'cursor':
+    la respuesta es {"asistencias": [...], "siguiente": <cursor o null>} y se genera fila por fila.
+    """
     # El Admin no ve el listado de asistencias. Solo el preceptor.
     if current_user.rol != 'preceptor':
         return jsonify({'error': 'No autorizado'}), 403
 
     # Si es preceptor, filtrar asistencias por sus cursos
     cursos_preceptor = current_user.cursos_a_cargo.split(',')
-    alumnos_en_cursos = Alumno.query.filter(Alumno.curso_anio.in_(cursos_preceptor)).all()
-    alumno_ids = [a.id for a in alumnos_en_cursos]
-    asistencias = Asistencia.query.filter(Asistencia.alumno_id.in_(alumno_ids)).all()
-    
-    return jsonify([a.to_dict() for a in asistencias])
+    curso = request.args.get('curso')
+    if curso:
+        if curso not in cursos_preceptor:
+            return jsonify({'error': 'No autorizado para ver asistencias fuera de sus cursos asignados'}), 403
+        cursos_preceptor = [curso]
+
+    try:
+        desde = date.fromisoformat(request.args['desde']) if request.args.get('desde') else None
+        hasta = date.fromisoformat(request.args['hasta']) if request.args.get('hasta') else None
+        limit = min(max(int(request.args.get('limit', ASISTENCIAS_LIMIT_DEFAULT)), 1), ASISTENCIAS_LIMIT_MAX)
+        cursor = int(request.args['cursor']) if request.args.get('cursor') else None
+    except ValueError as e:
+        return jsonify({'error': f'Parámetros inválidos: {str(e)}'}), 400
+
+    query = db.select(Asistencia.id, Asistencia.alumno_id, Asistencia.fecha, Asistencia.estado) \
+        .join(Alumno, Alumno.id == Asistencia.alumno_id) \
+        .where(Alumno.curso_anio.in_(cursos_preceptor))
+    if desde:
+        query = query.where(Asistencia.fecha >= desde)
+    if hasta:
+        query = query.where(Asistencia.fecha <= hasta)
+    if cursor is not None:
+        query = query.where(Asistencia.id < cursor)
+    # Se pide una fila de más para saber si hay otra página
+    query = query.order_by(Asistencia.id.desc()).limit(limit + 1)
+
+    def generar():
+        yield '{"asistencias": ['
+        ultimo_id = None
+        siguiente = None
+        for i, (id, alumno_id, fecha, estado) in enumerate(db.session.execute(query)):
+            if i == limit:
+                siguiente = ultimo_id
+                break
+            yield (',' if i else '') + json.dumps(
+                {'id': id, 'alumno_id': alumno_id, 'fecha': fecha.isoformat(), 'estado': estado})
+            ultimo_id = id
+        yield '], "siguiente": ' + json.dumps(siguiente) + '}'
+
+    return Response(stream_with_context(generar()), mimetype='application/json')
+
+@app.route('/asistencias/stream', methods=['GET'])
+@login_required
+def asistencias_stream():
+    """
+    Server-Sent Events con las asistencias registradas, modificadas o eliminadas en los cursos del
+    preceptor. Eventos: 'asistencia' (mismo formato que /asistencias), 'asistencia_eliminada' ({id})
+    y 'recargar' (el cliente perdió eventos y debe volver a pedir el listado). Se reanuda desde el
+    encabezado Last-Event-ID que envía el navegador al reconectarse.
+    """
+    if current_user.rol != 'preceptor':
+        return jsonify({'error': 'No autorizado'}), 403
+    eventos = asistencias_eventos.stream(current_user.cursos_a_cargo.split(','), request.headers.get('Last-Event-ID'))
+    response = Response(eventos, mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no' # Que un proxy nginx no acumule los eventos
+    return response
+
+@app.route('/asistencias/exportar', methods=['GET'])
+@login_required
+def exportar_asistencias_api():
+    """CSV de asistencias con alumno y curso (Admin solo). Filtros opcionales: desde, hasta (YYYY-MM-DD) y curso."""
+    if current_user.rol != 'admin':
+        return jsonify({'error': 'No autorizado'}), 403
+    try:
+        desde = date.fromisoformat(request.args['desde']) if request.args.get('desde') else None
+        hasta = date.fromisoformat(request.args['hasta']) if request.args.get('hasta') else None
+    except ValueError as e:
+        return jsonify({'error': f'Parámetros inválidos: {str(e)}'}), 400
+    cursos = request.args.getlist('curso') or None
+    response = Response(stream_with_context(exportar_asistencias_csv(desde, hasta, cursos)), mimetype='text/csv')
+    response.headers['Content-Disposition'] = 'attachment; filename=asistencias.csv'
+    return response
 
 @app.route('/asistencias/<int:id>', methods=['GET', 'PUT', 'DELETE'])
 @login_required
@@ -223,18 +762,29 @@ def asistencia_detalle(id):
         return jsonify(asistencia.to_dict())
     elif request.method == 'PUT':
         data = request.get_json()
+        curso_previo = asistencia.alumno.curso_anio if asistencia.alumno else None
         try:
             asistencia.alumno_id = data['alumno_id']
             asistencia.fecha = date.fromisoformat(data['fecha'])
             asistencia.estado = data['estado']
             db.session.commit()
-            return jsonify(asistencia.to_dict())
         except Exception as e:
             db.session.rollback()
             return jsonify({'error': str(e)}), 400
+        # Fuera del try: el cambio ya está guardado aunque falle el aviso a los clientes
+        curso = asistencia.alumno.curso_anio if asistencia.alumno else None
+        if curso_previo and curso_previo != curso:
+            # La asistencia pasó a un alumno de otro curso: los preceptores del anterior dejan de verla
+            asistencias_eventos.publish('asistencia_eliminada', {'id': asistencia.id}, canal=curso_previo)
+        if curso:
+            publicar_asistencia(asistencia.id, asistencia.alumno_id, asistencia.fecha, asistencia.estado, curso)
+        return jsonify(asistencia.to_dict())
     else: # DELETE
+        curso = asistencia.alumno.curso_anio if asistencia.alumno else None
         db.session.delete(asistencia)
         db.session.commit()
+        if curso:
+            asistencias_eventos.publish('asistencia_eliminada', {'id': id}, canal=curso)
         return jsonify({'mensaje': 'Asistencia eliminada'}), 204
 
 @app.route('/asistencias/registrar', methods=['POST'])
@@ -265,6 +815,7 @@ def registrar_asistencia_api():
         if existing_asistencia.estado != estado:
             existing_asistencia.estado = estado
             db.session.commit()
+            publicar_asistencia(existing_asistencia.id, alumno.id, existing_asistencia.fecha, estado, alumno.curso_anio)
             return jsonify({'mensaje': f'Asistencia de alumno {alumno_id} actualizada a {estado} para hoy.'}), 200
         else:
             return jsonify({'mensaje': f'Asistencia de alumno {alumno_id} ya registrada como {estado} para hoy.'}), 200
@@ -273,11 +824,219 @@ def registrar_asistencia_api():
             new_asistencia = Asistencia(alumno_id=alumno_id, fecha=date.today(), estado=estado)
             db.session.add(new_asistencia)
             db.session.commit()
-            return jsonify({'mensaje': f'Asistencia registrada para el alumno {alumno_id} como {estado}.'}), 201
         except Exception as e:
             db.session.rollback()
             return jsonify({'error': f'Error al registrar asistencia: {str(e)}'}), 500
+        publicar_asistencia(new_asistencia.id, alumno.id, new_asistencia.fecha, estado, alumno.curso_anio)
+        return jsonify({'mensaje': f'Asistencia registrada para el alumno {alumno_id} como {estado}.'}), 201
+
+
+def _registro_autorizado():
+    # Con REGISTRO_TOKEN configurado se exige el token; si no, solo se aceptan pedidos locales
+    token = app.config['REGISTRO_TOKEN']
+    if token:
+        return hmac.compare_digest(request.headers.get('X-Registro-Token', ''), token)
+    return request.remote_addr in ('127.0.0.1', '::1')
+
+@app.route('/asistencias/registrar_lote', methods=['POST'])
+def registrar_asistencias_lote_api():
+    """
+    Registra varias asistencias en una sola transacción.
+    Recibe una lista de {alumno_id, estado, fecha}; estado y fecha son opcionales ('Presente' y hoy).
+    La usa el proceso de reconocimiento, así que no requiere sesión: se identifica con el token
+    REGISTRO_TOKEN o, si no hay token configurado, llamando desde la misma máquina. Solo acepta
+    estados de ESTADOS_ASISTENCIA y fechas de los últimos REGISTRO_DIAS_ATRAS días.
+    """
+    if not _registro_autorizado():
+        return jsonify({'error': 'No autorizado'}), 403
+    data = request.get_json(silent=True)
+    if isinstance(data, dict):
+        data = data.get('asistencias')
+    if not isinstance(data, list):
+        return jsonify({'error': 'Se espera una lista de asistencias'}), 400
+
+    hoy = date.today()
+    primer_dia = hoy - timedelta(days=app.config['REGISTRO_DIAS_ATRAS'])
+    resultados = [None] * len(data)
+    filas = {} # (alumno_id, fecha) -> (indice, fila); si se repite la clave gana la última
+    for indice, item in enumerate(data):
+        try:
+            alumno_id = int(item['alumno_id'])
+            fecha = date.fromisoformat(item['fecha']) if item.get('fecha') else hoy
+            estado = item.get('estado') or 'Presente'
+            if estado not in ESTADOS_ASISTENCIA:
+                raise ValueError(f"estado debe ser uno de {', '.join(ESTADOS_ASISTENCIA)}")
+            if not primer_dia <= fecha <= hoy:
+                raise ValueError(f'fecha fuera del rango {primer_dia.isoformat()} a {hoy.isoformat()}')
+        except (KeyError, TypeError, ValueError) as e:
+            resultados[indice] = {'indice': indice, 'resultado': 'error', 'error': f'Datos inválidos: {e}'}
+            continue
+        clave = (alumno_id, fecha)
+        if clave in filas:
+            anterior = filas[clave][0]
+            resultados[anterior] = {'indice': anterior, 'alumno_id': alumno_id, 'resultado': 'reemplazada'}
+        filas[clave] = (indice, {'alumno_id': alumno_id, 'fecha': fecha, 'estado': estado})
 
+    # Validar todos los IDs con una sola consulta
+    ids = {alumno_id for alumno_id, _ in filas}
+    cursos = dict(db.session.query(Alumno.id, Alumno.curso_anio).filter(Alumno.id.in_(ids))) if ids else {}
+    for (alumno_id, fecha), (indice, _) in list(filas.items()):
+        if alumno_id not in cursos:
+            resultados[indice] = {'indice': indice, 'alumno_id': alumno_id, 'resultado': 'error', 'error': 'Alumno no encontrado'}
+            del filas[(alumno_id, fecha)]
+
+    if filas:
+        try:
+            # Estado previo de las claves afectadas, para el resumen y para informar si cada fila se
+            # creó o se actualizó. Es un UPDATE que no cambia nada en lugar de un SELECT: toma el lock
+            # de escritura de SQLite antes de leer, así otro lote no puede cambiar estas filas hasta
+            # el commit y sus cambios no se cuentan dos veces en el resumen.
+            tabla = Asistencia.__table__
+            previas = dict(((a, f), e) for a, f, e in db.session.execute(
+                db.update(tabla).where(db.tuple_(tabla.c.alumno_id, tabla.c.fecha).in_(list(filas)))
+                .values(estado=tabla.c.estado).returning(tabla.c.alumno_id, tabla.c.fecha, tabla.c.estado)))
+            stmt = sqlite_insert(Asistencia.__table__)
+            stmt = stmt.on_conflict_do_update(
+                index_elements=['alumno_id', 'fecha'],
+                set_={'estado': stmt.excluded.estado},
+                where=Asistencia.__table__.c.estado != stmt.excluded.estado,
+            )
+            # RETURNING devuelve solo las filas insertadas o cambiadas, que son las que se publican
+            cambiadas = db.session.execute(
+                stmt.returning(Asistencia.id, Asistencia.alumno_id, Asistencia.fecha, Asistencia.estado),
+                [fila for _, fila in filas.values()]).all()
+            # El upsert no pasa por el ORM: el resumen se ajusta a mano con los estados previos
+            deltas = {}
+            for clave, (_, fila) in filas.items():
+                if previas.get(clave) == fila['estado']:
+                    continue
+                if clave in previas:
+                    deltas[(*clave, previas[clave])] = deltas.get((*clave, previas[clave]), 0) - 1
+                deltas[(*clave, fila['estado'])] = deltas.get((*clave, fila['estado']), 0) + 1
+            ajustar_resumen(db.session.connection(), deltas)
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            return jsonify({'error': f'Error al registrar asistencias: {str(e)}'}), 500
+        for id, alumno_id, fecha, estado in cambiadas:
+            publicar_asistencia(id, alumno_id, fecha, estado, cursos[alumno_id])
+
+        for clave, (indice, fila) in filas.items():
+            if clave not in previas:
+                resultado = 'creada'
+            elif previas[clave] != fila['estado']:
+                resultado = 'actualizada'
+            else:
+                resultado = 'sin_cambios'
+            resultados[indice] = {'indice': indice, 'alumno_id': fila['alumno_id'], 'resultado': resultado}
+
+    resumen = {}
+    for r in resultados:
+        resumen[r['resultado']] = resumen.get(r['resultado'], 0) + 1
+    return jsonify({'resumen': resumen, 'resultados': resultados}), 200
+
+@app.route('/asistencias/cerrar_dia', methods=['POST'])
+@login_required
+def cerrar_dia_api():
+    """
+    Marca como 'Ausente' a los alumnos sin asistencia en los días indicados (Admin solo).
+    Recibe {desde, hasta, cursos}: desde por defecto es hoy, hasta por defecto es desde y sin
+    cursos se cierran todos.
+    """
+    if current_user.rol != 'admin':
+        return jsonify({'error': 'No autorizado'}), 403
+    data = request.get_json(silent=True) or {}
+    try:
+        desde = date.fromisoformat(data['desde']) if data.get('desde') else date.today()
+        hasta = date.fromisoformat(data['hasta']) if data.get('hasta') else desde
+        cursos = data.get('cursos') or None
+        if cursos is not None and not isinstance(cursos, list):
+            raise ValueError("'cursos' debe ser una lista")
+        if cursos is not None and not all(isinstance(c, str) and c.strip() for c in cursos):
+            # Un curso que no es texto rompería el IN y además abriría un canal de eventos sin sentido
+            raise ValueError("cada elemento de 'cursos' debe ser un texto no vacío")
+        creadas = cerrar_dia(db.session.connection(), desde, hasta, cursos)
+        db.session.commit()
+    except (TypeError, ValueError) as e:
+        db.session.rollback()
+        return jsonify({'error': f'Parámetros inválidos: {str(e)}'}), 400
+    if creadas:
+        # Pueden ser miles de filas: se avisa a los clientes que recarguen en lugar de mandar cada una
+        for curso in cursos or [None]:
+            asistencias_eventos.publish('recargar', {}, canal=curso)
+    return jsonify({'mensaje': f'{creadas} ausencias registradas.', 'creadas': creadas,
+                    'desde': desde.isoformat(), 'hasta': hasta.isoformat()}), 200
+
+# --- Reportes ---
+
+def _tasas(cantidades):
+    # Agrega a un {estado: cantidad} el total y la proporción de cada estado
+    total = sum(cantidades.values())
+    return {'cantidades': cantidades, 'total': total,
+            'tasas': {estado: round(n / total, 4) for estado, n in cantidades.items()} if total else {}}
+
+@app.route('/reportes/asistencia', methods=['GET'])
+@login_required
+def reporte_asistencia():
+    """
+    Tasas de asistencia leídas de las tablas de resumen, sin recorrer las asistencias.
+    'por' agrupa por curso (por defecto), dia (curso y fecha) o alumno. Filtros opcionales: curso,
+    desde y hasta (YYYY-MM-DD; no se aplican al reporte por alumno, que es acumulado).
+    El preceptor solo ve sus cursos; el admin, todos.
+    """
+    por = request.args.get('por', 'curso')
+    if por not in ('curso', 'dia', 'alumno'):
+        return jsonify({'error': "'por' debe ser curso, dia o alumno"}), 400
+    try:
+        desde = date.fromisoformat(request.args['desde']) if request.args.get('desde') else None
+        hasta = date.fromisoformat(request.args['hasta']) if request.args.get('hasta') else None
+    except ValueError as e:
+        return jsonify({'error': f'Parámetros inválidos: {str(e)}'}), 400
+    if por == 'alumno' and (desde or hasta):
+        return jsonify({'error': 'El reporte por alumno es acumulado: no admite desde/hasta'}), 400
+
+    cursos = None # None = todos
+    if current_user.rol == 'preceptor':
+        cursos = current_user.cursos_a_cargo.split(',')
+    curso = request.args.get('curso')
+    if curso:
+        if cursos is not None and curso not in cursos:
+            return jsonify({'error': 'No autorizado para ver asistencias fuera de sus cursos asignados'}), 403
+        cursos = [curso]
+
+    if por == 'alumno':
+        query = db.select(ResumenAsistenciaAlumno.alumno_id, ResumenAsistenciaAlumno.estado,
+                          ResumenAsistenciaAlumno.cantidad) \
+            .join(Alumno, Alumno.id == ResumenAsistenciaAlumno.alumno_id)
+        if cursos is not None:
+            query = query.where(Alumno.curso_anio.in_(cursos))
+        grupos = {}
+        for alumno_id, estado, cantidad in db.session.execute(query):
+            if cantidad:
+                grupos.setdefault(alumno_id, {})[estado] = cantidad
+        return jsonify({'por': por, 'filas': [dict(alumno_id=alumno_id, **_tasas(cantidades))
+                                              for alumno_id, cantidades in sorted(grupos.items())]})
+
+    columnas = [ResumenAsistencia.curso_anio] + ([ResumenAsistencia.fecha] if por == 'dia' else [])
+    query = db.select(*columnas, ResumenAsistencia.estado, db.func.sum(ResumenAsistencia.cantidad)) \
+        .group_by(*columnas, ResumenAsistencia.estado)
+    if cursos is not None:
+        query = query.where(ResumenAsistencia.curso_anio.in_(cursos))
+    if desde:
+        query = query.where(ResumenAsistencia.fecha >= desde)
+    if hasta:
+        query = query.where(ResumenAsistencia.fecha <= hasta)
+    grupos = {}
+    for *clave, estado, cantidad in db.session.execute(query):
+        if cantidad:
+            grupos.setdefault(tuple(clave), {})[estado] = cantidad
+    filas = []
+    for clave, cantidades in sorted(grupos.items()):
+        fila = {'curso_anio': clave[0]}
+        if por == 'dia':
+            fila['fecha'] = clave[1].isoformat()
+        filas.append(dict(fila, **_tasas(cantidades)))
+    return jsonify({'por': por, 'filas': filas})
 
 # --- Rutas de Gestión de Preceptores (Admin solo) ---
 
@@ -336,9 +1095,68 @@ def detalle_preceptor(id):
 
 # --- Rutas de Reconocimiento Facial (Admin y Preceptor) ---
 
+# Encabezados que no se copian al reenviar una respuesta del worker de visión. Content-Encoding sí
+# se copia: el cuerpo se reenvía tal como llega, sin descomprimir
+_ENCABEZADOS_SALTO = {'connection', 'keep-alive', 'transfer-encoding', 'content-length'}
+
+def _reenviar_a_vision(continua=False):
+    # Import diferido: solo el perfil web reenvía requests
+    import requests
+    url = app.config['VISION_URL'].rstrip('/') + request.full_path.rstrip('?')
+    # La cookie de sesión viaja tal cual: el worker de visión comparte SECRET_KEY y base de datos
+    headers = {k: v for k, v in request.headers.items()
+               if k.lower() in ('cookie', 'content-type', 'accept', 'accept-encoding')}
+    # Una respuesta continua (la vista previa) puede pasar un rato sin datos; el resto tiene un
+    # tiempo máximo para que un worker trabado no deje bloqueado a este
+    lectura = None if continua else app.config['VISION_TIMEOUT']
+    try:
+        respuesta = requests.request(request.method, url, headers=headers, data=request.get_data(), stream=True,
+                                     timeout=(3, lectura), allow_redirects=False)
+    except requests.exceptions.RequestException as e:
+        return jsonify({'error': f'El servicio de visión no responde: {str(e)}'}), 503
+
+    def contenido():
+        # Se reenvía a medida que llega, así también funciona con la vista previa MJPEG
+        try:
+            yield from respuesta.raw.stream(64 * 1024, decode_content=False)
+        finally:
+            respuesta.close()
+
+    return Response(contenido(), status=respuesta.status_code,
+                    headers=[(k, v) for k, v in respuesta.raw.headers.items() if k.lower() not in _ENCABEZADOS_SALTO])
+
+def ruta_de_vision(f=None, continua=False):
+    """
+    Con PERFIL='web' la ruta la atiende el worker de visión; si no, este proceso.
+    continua=True marca respuestas sin fin (la vista previa MJPEG), que se reenvían sin VISION_TIMEOUT.
+    """
+    if f is None:
+        return lambda f: ruta_de_vision(f, continua)
+    @wraps(f)
+    def decorada(*args, **kwargs):
+        if app.config['PERFIL'] == 'web':
+            return _reenviar_a_vision(continua)
+        return f(*args, **kwargs)
+    return decorada
+
+def _detection_options():
+    return {
+        'scale': app.config['DETECCION_ESCALA'],
+        'detection_interval': app.config['DETECCION_INTERVALO'],
+        'min_face_size': app.config['DETECCION_TAMANO_MINIMO'],
+    }
+
+def _job_response(job, mensaje, **extra):
+    return jsonify({'mensaje': mensaje, 'job_id': job.id, 'estado_url': url_for('estado_job', job_id=job.id), **extra}), 202
+
+def _recurso_ocupado_response(e):
+    return jsonify({'error': str(e), 'job_id': e.job_id}), 409
+
 @app.route('/alumnos/<int:id>/capturar_rostros', methods=['POST'])
 @login_required
+@ruta_de_vision
 def capturar_rostros_alumno(id):
+    from face_recognition.face_capture import capture_faces
     if current_user.rol != 'admin':
         return jsonify({'error': 'No autorizado'}), 403
     
@@ -348,44 +1166,148 @@ def capturar_rostros_alumno(id):
     
     print(f"Iniciando captura de rostros para el alumno ID: {id} ({alumno.nombre} {alumno.apellido})")
     try:
-        capture_faces(id)
-        return jsonify({'mensaje': f'Captura de rostros iniciada para el alumno {id}. Revisa la consola para el progreso.'}), 202
+        detection_options = _detection_options()
+        display = app.config['RECONOCIMIENTO_VENTANA']
+        job = jobs.submit('captura', 'camara', lambda job: capture_faces(
+            id, progress=job.report, cancel_event=job.cancel_event, detection_options=detection_options,
+            display=display),
+            propietario=current_user.id)
+        return _job_response(job, f'Captura de rostros iniciada para el alumno {id}.')
+    except RecursoOcupado as e:
+        return _recurso_ocupado_response(e)
     except Exception as e:
         return jsonify({'error': f'Error al iniciar captura de rostros: {str(e)}'}), 500
 
 @app.route('/reconocimiento/entrenar', methods=['POST'])
 @login_required
+@ruta_de_vision
 def entrenar_reconocedor():
+    from face_recognition.face_recognizer import train_recognizer
     if current_user.rol != 'admin':
         return jsonify({'error': 'No autorizado'}), 403
     print("Iniciando entrenamiento del reconocedor facial...")
+    # Por defecto el entrenamiento es incremental; {"completo": true} fuerza reentrenar desde cero
+    data = request.get_json(silent=True) or {}
+    incremental = not data.get('completo', False)
     try:
-        success = train_recognizer()
-        if success:
-            return jsonify({'mensaje': 'Entrenamiento del reconocedor facial completado.'}), 200
-        else:
-            return jsonify({'mensaje': 'Entrenamiento del reconocedor facial no completado. Posiblemente no hay datos de rostros.'}), 200
+        job = jobs.submit('entrenamiento', 'entrenador', lambda job: train_recognizer(
+            incremental=incremental, progress=job.report, cancel_event=job.cancel_event),
+            propietario=current_user.id)
+        return _job_response(job, 'Entrenamiento del reconocedor facial iniciado.')
+    except RecursoOcupado as e:
+        return _recurso_ocupado_response(e)
     except Exception as e:
         return jsonify({'error': f'Error durante el entrenamiento: {str(e)}'}), 500
 
 @app.route('/reconocimiento/iniciar', methods=['POST'])
 @login_required
+@ruta_de_vision
 def iniciar_reconocimiento():
+    from face_recognition.face_recognizer import recognize_face
+    from face_recognition.preview import get_preview
+    from face_recognition.recognition_service import run_recognition_service
+    from face_recognition.video_sources import source_name
     # Permitir que el admin o el preceptor inicien el reconocimiento
     if current_user.rol not in ['admin', 'preceptor']:
         return jsonify({'error': 'No autorizado'}), 403
     
     print("Iniciando reconocimiento facial en tiempo real...")
+    data = request.get_json(silent=True) or {}
+    workers = data.get('workers', app.config['RECONOCIMIENTO_WORKERS'])
+    # bool es subclase de int: true/false no son una cantidad de hilos
+    if not isinstance(workers, int) or isinstance(workers, bool) or \
+            not 1 <= workers <= app.config['RECONOCIMIENTO_WORKERS']:
+        return jsonify({'error': f"workers debe ser un entero entre 1 y {app.config['RECONOCIMIENTO_WORKERS']}"}), 400
+    pipelined = data.get('pipeline', app.config['RECONOCIMIENTO_PIPELINE'])
+    if not isinstance(pipelined, bool):
+        return jsonify({'error': 'pipeline debe ser true o false'}), 400
+    options = {
+        'pipelined': pipelined,
+        'workers': workers,
+        'detection_options': _detection_options(),
+    }
+    # Solo se aceptan fuentes configuradas: una ruta o URL arbitraria la abriría OpenCV en el servidor
+    configuradas = {str(f): f for f in app.config['RECONOCIMIENTO_FUENTES']}
+    fuentes = data.get('fuentes')
+    if fuentes is None:
+        fuentes = app.config['RECONOCIMIENTO_FUENTES']
+    elif not isinstance(fuentes, list) or not fuentes or not all(str(f) in configuradas for f in fuentes):
+        return jsonify({'error': f'fuentes debe ser una lista con fuentes configuradas: '
+                                 f'{", ".join(configuradas)}'}), 400
+    else:
+        fuentes = list(dict.fromkeys(configuradas[str(f)] for f in fuentes))
     try:
         # Obtener un mapa de alumno_id a nombre completo para mostrar en el feed de la cámara
         alumnos = Alumno.query.all()
         alumno_id_map = {str(a.id): f"{a.nombre} {a.apellido}" for a in alumnos}
         
-        recognize_face(alumno_id_map)
-        return jsonify({'mensaje': 'Reconocimiento facial iniciado. Revisa la ventana de la cámara.'}), 202
+        if len(fuentes) > 1:
+            # Varias fuentes: una por proceso, compartiendo el modelo cargado (sin vista previa)
+            run = lambda job: run_recognition_service(
+                fuentes, alumno_id_map, progress=job.report, cancel_event=job.cancel_event, **options)
+            job = jobs.submit('reconocimiento', 'camara', run, propietario=current_user.id)
+            return _job_response(job, 'Reconocimiento facial iniciado.')
+        fuente = source_name(fuentes[0])
+        preview = get_preview(fuente, max_fps=app.config['PREVIEW_MAX_FPS'])
+        run = lambda job: recognize_face(
+            alumno_id_map, progress=job.report, cancel_event=job.cancel_event, source=fuentes[0],
+            display=app.config['RECONOCIMIENTO_VENTANA'], preview=preview, **options)
+        job = jobs.submit('reconocimiento', 'camara', run, propietario=current_user.id)
+        return _job_response(job, 'Reconocimiento facial iniciado.',
+                             preview_url=url_for('preview_reconocimiento', fuente=fuente))
+    except RecursoOcupado as e:
+        return _recurso_ocupado_response(e)
     except Exception as e:
         return jsonify({'error': f'Error al iniciar reconocimiento facial: {str(e)}'}), 500
 
+@app.route('/reconocimiento/preview', methods=['GET'])
+@login_required
+@ruta_de_vision(continua=True)
+def preview_reconocimiento():
+    from face_recognition.preview import get_preview, BOUNDARY
+    from face_recognition.video_sources import source_name
+    if current_user.rol not in ['admin', 'preceptor']:
+        return jsonify({'error': 'No autorizado'}), 403
+    # Los frames se anotan y codifican solo mientras haya algún cliente conectado a este stream
+    fuente = request.args.get('fuente') or source_name(app.config['RECONOCIMIENTO_FUENTES'][0])
+    # Solo las fuentes configuradas: cada nombre nuevo crearía otra vista previa que no se libera nunca
+    if fuente not in {source_name(f) for f in app.config['RECONOCIMIENTO_FUENTES']}:
+        return jsonify({'error': 'Fuente desconocida'}), 404
+    preview = get_preview(fuente, max_fps=app.config['PREVIEW_MAX_FPS'])
+    response = Response(stream_with_context(preview.frames()), mimetype=f'multipart/x-mixed-replace; boundary={BOUNDARY}')
+    response.headers['Cache-Control'] = 'no-store'
+    return response
+
+# --- Rutas de Trabajos en Segundo Plano ---
+
+def _job_visible(job_id):
+    # El admin ve todos los trabajos; el resto, solo los que inició. Los ajenos responden 404 como si no existieran
+    job = jobs.get(job_id)
+    if job is None or (current_user.rol != 'admin' and job.propietario != current_user.id):
+        return None
+    return job
+
+@app.route('/jobs/<job_id>', methods=['GET'])
+@login_required
+@ruta_de_vision
+def estado_job(job_id):
+    if current_user.rol not in ['admin', 'preceptor']:
+        return jsonify({'error': 'No autorizado'}), 403
+    job = _job_visible(job_id)
+    if job is None:
+        return jsonify({'error': 'Trabajo no encontrado'}), 404
+    return jsonify(job.to_dict())
+
+@app.route('/jobs/<job_id>/cancelar', methods=['POST'])
+@login_required
+@ruta_de_vision
+def cancelar_job(job_id):
+    if current_user.rol not in ['admin', 'preceptor']:
+        return jsonify({'error': 'No autorizado'}), 403
+    if _job_visible(job_id) is None or not jobs.cancel(job_id):
+        return jsonify({'error': 'Trabajo no encontrado o ya finalizado'}), 404
+    return jsonify({'mensaje': 'Cancelación solicitada.', 'job_id': job_id}), 202
+
 # --- Comandos de CLI Personalizados ---
 
 @app.cli.command('init-db')
@@ -395,6 +1317,193 @@ def init_db_command():
     db.create_all()
     click.echo('Base de datos inicializada.')
 
+@app.cli.command('migrar-db')
+@with_appcontext
+def migrar_db_command():
+    """Agrega a una base existente los índices del modelo, eliminando antes las asistencias duplicadas."""
+    db.create_all() # Crea las tablas que falten; no modifica las existentes
+    with db.engine.begin() as conn:
+        # Por cada (alumno_id, fecha) repetido se conserva el registro más reciente
+        duplicadas = conn.execute(db.text(
+            'DELETE FROM asistencia WHERE id NOT IN '
+            '(SELECT MAX(id) FROM asistencia GROUP BY alumno_id, fecha)'
+        )).rowcount
+        click.echo(f'Asistencias duplicadas eliminadas: {duplicadas}')
+        for table in (Alumno.__table__, Asistencia.__table__):
+            for index in table.indexes:
+                index.create(conn, checkfirst=True)
+                click.echo(f'Índice {index.name} verificado.')
+        reconstruir_resumen(conn)
+        click.echo('Resumen de asistencia reconstruido.')
+        conn.execute(db.text('ANALYZE'))
+    click.echo('Migración completada.')
+
+@app.cli.command('reconstruir-resumen')
+@with_appcontext
+def reconstruir_resumen_command():
+    """Recalcula las tablas de resumen de asistencia a partir de todas las asistencias."""
+    db.create_all() # Crea las tablas de resumen en bases anteriores
+    with db.engine.begin() as conn:
+        reconstruir_resumen(conn)
+        filas = conn.execute(db.select(db.func.count()).select_from(ResumenAsistencia.__table__)).scalar()
+    click.echo(f'Resumen reconstruido: {filas} filas por curso, día y estado.')
+
+@app.cli.command('cerrar-dia')
+@click.option('--desde', help='Primer día a cerrar (YYYY-MM-DD). Por defecto, hoy.')
+@click.option('--hasta', help='Último día a cerrar (YYYY-MM-DD). Por defecto, el mismo que --desde.')
+@click.option('--curso', 'cursos', multiple=True, help='Curso a cerrar. Se puede repetir; por defecto, todos.')
+@with_appcontext
+def cerrar_dia_command(desde, hasta, cursos):
+    """Registra 'Ausente' a cada alumno sin asistencia en los días indicados."""
+    try:
+        desde = date.fromisoformat(desde) if desde else date.today()
+        hasta = date.fromisoformat(hasta) if hasta else desde
+        with db.engine.begin() as conn:
+            creadas = cerrar_dia(conn, desde, hasta, list(cursos) or None)
+    except ValueError as e:
+        raise click.BadParameter(str(e))
+    click.echo(f'{creadas} ausencias registradas entre {desde} y {hasta}.')
+
+@app.cli.command('importar-alumnos')
+@click.argument('archivo', type=click.File('r', encoding='utf-8-sig'))
+@click.option('--formato', type=click.Choice(IMPORTACION_FORMATOS),
+              help='Formato del archivo. Por defecto, según la extensión (.jsonl/.ndjson o CSV).')
+@with_appcontext
+def importar_alumnos_command(archivo, formato):
+    """Da de alta los alumnos de un CSV con encabezado o de un archivo JSON lines ('-' lee la entrada estándar)."""
+    if formato is None:
+        formato = 'jsonl' if archivo.name.endswith(('.jsonl', '.ndjson')) else 'csv'
+    resultado = importar_alumnos(leer_filas(archivo, formato))
+    for error in resultado['errores']:
+        click.echo(f"Fila {error['fila']}: {error['error']}")
+    click.echo(f"{resultado['importados']} alumnos importados, {resultado['con_error']} filas con error.")
+
+@app.cli.command('exportar-asistencias')
+@click.option('--desde', help='Primer día (YYYY-MM-DD).')
+@click.option('--hasta', help='Último día (YYYY-MM-DD).')
+@click.option('--curso', 'cursos', multiple=True, help='Curso a exportar. Se puede repetir; por defecto, todos.')
+@click.option('--salida', '-o', type=click.File('w', encoding='utf-8'), default='-',
+              help='Archivo CSV de salida. Por defecto, la salida estándar.')
+@with_appcontext
+def exportar_asistencias_command(desde, hasta, cursos, salida):
+    """Exporta las asistencias, con alumno y curso, a CSV."""
+    try:
+        desde = date.fromisoformat(desde) if desde else None
+        hasta = date.fromisoformat(hasta) if hasta else None
+    except ValueError as e:
+        raise click.BadParameter(str(e))
+    for linea in exportar_asistencias_csv(desde, hasta, list(cursos) or None):
+        salida.write(linea)
+
+@app.cli.command('reconocer')
+@click.option('--fuente', '-f', 'fuentes', multiple=True,
+              help='Índice de cámara, archivo de video o directorio de imágenes. Se puede repetir.')
+@click.option('--threshold', default=60, show_default=True, help='Confianza máxima para aceptar un reconocimiento.')
+@with_appcontext
+def reconocer_command(fuentes, threshold):
+    """Ejecuta el reconocimiento sobre una o más fuentes de video sin mostrar ventanas."""
+    from face_recognition.recognition_service import run_recognition_service
+    fuentes = list(fuentes) or app.config['RECONOCIMIENTO_FUENTES']
+    alumno_id_map = {str(a.id): f"{a.nombre} {a.apellido}" for a in Alumno.query.all()}
+    estado = run_recognition_service(fuentes, alumno_id_map, threshold=threshold,
+                                     pipelined=app.config['RECONOCIMIENTO_PIPELINE'],
+                                     workers=app.config['RECONOCIMIENTO_WORKERS'],
+                                     detection_options=_detection_options())
+    if estado is None:
+        click.echo('No se pudo cargar el modelo de entrenamiento.')
+        return
+    for name, info in estado.items():
+        click.echo(f"{name}: {info['estado']} {json.dumps(info.get('stats') or info.get('error'))}")
+
+@app.cli.command('bench-recognition')
+@click.argument('fuentes', nargs=-1)
+@click.option('--threshold', default=60, show_default=True, help='Confianza máxima para aceptar un reconocimiento.')
+@click.option('--salida', '-o', default='bench_recognition.json', show_default=True, help='Archivo JSON de resultados.')
+@click.option('--motor', type=click.Choice(['auto', 'opencv', 'numpy']), default='auto', show_default=True,
+              help='Motor de comparación de histogramas.')
+def bench_recognition_command(fuentes, threshold, salida, motor):
+    """
+    Mide el reconocimiento sobre videos o directorios de imágenes grabados (por defecto, cada
+    face_recognition/datasets/<id>). Una fuente 'ruta@ID' indica el alumno que aparece en ella.
+    """
+    from face_recognition.benchmark import run_benchmark
+    result = run_benchmark(list(fuentes), threshold=threshold, detection_options=_detection_options(), output=salida,
+                           engine=motor)
+    if result is None:
+        click.echo('No se pudo cargar el modelo de entrenamiento.')
+        return
+    for name, info in result['fuentes'].items():
+        click.echo(f"{name}: {json.dumps({k: info.get(k) for k in ('fps', 'rostros', 'exactitud', 'tasa_falsa_aceptacion', 'error') if k in info})}")
+    click.echo(f"Total: {json.dumps(result['total'])} - pico de memoria: {result['pico_rss_mb']} MB")
+
+@app.cli.command('empaquetar-datasets')
+@click.option('--borrar-jpg', is_flag=True, help='Borra las imágenes JPEG una vez empaquetadas.')
+def empaquetar_datasets_command(borrar_jpg):
+    """Convierte las imágenes JPEG de face_recognition/datasets/<id> al almacén empaquetado de cada alumno."""
+    from face_recognition.sample_store import convert_datasets
+    resultado = convert_datasets('./face_recognition/datasets', remove=borrar_jpg)
+    click.echo(f'{sum(resultado.values())} imágenes empaquetadas en {len(resultado)} directorios.')
+
+@app.cli.command('servir-vision')
+@click.option('--host', default='127.0.0.1', show_default=True)
+@click.option('--puerto', default=5001, show_default=True, help='Debe coincidir con VISION_URL del servidor web.')
+@click.option('--api-url', envvar='ASISTENCIA_API_URL', default='http://127.0.0.1:5000', show_default=True,
+              help='URL del servidor web al que se envían las asistencias reconocidas.')
+def servir_vision_command(host, puerto, api_url):
+    """
+    Worker de visión para un servidor web con PERFIL='web': atiende las rutas de captura,
+    entrenamiento, reconocimiento y trabajos. Es un único proceso porque los trabajos viven en memoria.
+    """
+    from face_recognition import face_recognizer
+    from face_recognition.face_recognizer import get_model_holder
+    # Antes de que se cree el emisor de asistencias, que toma la URL al arrancar
+    face_recognizer.FLASK_API_BASE_URL = api_url.rstrip('/')
+    app.config['PERFIL'] = 'completo'
+    from werkzeug.serving import run_simple
+    get_model_holder().get() # Cargar OpenCV y el modelo antes del primer request
+    # app.run() no arranca dentro de un comando de flask: se usa el servidor de werkzeug directamente
+    run_simple(host, puerto, app, threaded=True)
+
+# Se ejecuta en un proceso nuevo por medición; {vision} importa lo que antes se cargaba siempre
+_MEDICION_ARRANQUE = """
+import json, sys, time
+inicio = time.perf_counter()
+import app
+if {vision}:
+    import face_recognition.face_capture, face_recognition.face_recognizer, face_recognition.recognition_service
+    import face_recognition.benchmark, face_recognition.preview
+segundos = time.perf_counter() - inicio
+try:
+    import resource
+    rss_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024 # KB en Linux
+except ImportError:
+    rss_mb = None
+print(json.dumps({{'segundos': segundos, 'rss_mb': rss_mb, 'opencv': 'cv2' in sys.modules}}))
+"""
+
+@app.cli.command('medir-arranque')
+@click.option('--repeticiones', '-n', default=5, show_default=True, help='Procesos por perfil; se informa la mediana.')
+def medir_arranque_command(repeticiones):
+    """
+    Mide, en procesos nuevos, cuánto tarda en importarse app.py y el pico de memoria (RSS) del
+    proceso: solo la parte web (lo que carga un worker o 'flask init-db') y con los módulos de visión.
+    """
+    import statistics
+    import subprocess
+    import sys
+    directorio = os.path.dirname(os.path.abspath(__file__))
+    for perfil, vision in (('web', False), ('web + visión', True)):
+        mediciones = []
+        for _ in range(repeticiones):
+            salida = subprocess.run([sys.executable, '-c', _MEDICION_ARRANQUE.format(vision=vision)], cwd=directorio,
+                                    capture_output=True, text=True, check=True).stdout
+            mediciones.append(json.loads(salida.strip().splitlines()[-1]))
+        segundos = statistics.median(m['segundos'] for m in mediciones)
+        rss = [m['rss_mb'] for m in mediciones if m['rss_mb'] is not None]
+        click.echo(f"{perfil}: importación {segundos:.3f}s, RSS "
+                   f"{f'{statistics.median(rss):.1f} MB' if rss else 'no disponible'}, "
+                   f"OpenCV cargado: {'sí' if mediciones[0]['opencv'] else 'no'}")
+
 @app.cli.command('crear-admin')
 @click.argument('username')
 @click.argument('password')
@@ -0,0 +1,88 @@
+import json
+import threading
+import uuid
+from collections import deque
+
+HISTORIAL = 1000 # Eventos que se guardan para poder reanudar con Last-Event-ID
+KEEPALIVE = 15 # Segundos sin eventos antes de mandar un comentario (mantiene viva la conexión y detecta clientes caídos)
+RETRY_MS = 3000 # Espera que el navegador deja pasar antes de reconectarse
+
+class Broadcaster:
+    """
+    Difunde eventos a los clientes Server-Sent Events conectados a este proceso.
+
+    publish() guarda el evento en un historial acotado y despierta a los clientes; stream() es el
+    generador de un cliente y solo le envía los eventos de sus canales (los publicados sin canal
+    van a todos). Los ids son '<época>-<n>': si el navegador se reconecta con un Last-Event-ID de
+    esta misma época que sigue en el historial, recibe lo que se perdió; si no (el servidor se
+    reinició o pasaron más de `historial` eventos) recibe un evento 'recargar' para que vuelva a
+    pedir el listado completo. Los eventos no se comparten entre procesos.
+    """
+
+    def __init__(self, historial=HISTORIAL, keepalive=KEEPALIVE):
+        self.epoch = uuid.uuid4().hex[:8]
+        self.keepalive = keepalive
+        self.clients = 0
+        self._events = deque(maxlen=historial) # (n, canal, tipo, datos en JSON)
+        self._last = 0
+        self._cond = threading.Condition()
+
+    def publish(self, tipo, datos, canal=None):
+        """Publica un evento y devuelve su id."""
+        payload = json.dumps(datos)
+        with self._cond:
+            self._last += 1
+            self._events.append((self._last, canal, tipo, payload))
+            self._cond.notify_all()
+            return f'{self.epoch}-{self._last}'
+
+    def _resume_from(self, last_event_id):
+        # Número desde el que se puede seguir sin perder eventos, o None si no se puede
+        epoch, _, n = (last_event_id or '').partition('-')
+        if epoch != self.epoch or not n.isdigit():
+            return None
+        n = int(n)
+        with self._cond:
+            oldest = self._events[0][0] if self._events else self._last + 1
+            return n if oldest - 1 <= n <= self._last else None
+
+    def stream(self, canales=None, last_event_id=None):
+        """Generador de texto text/event-stream para un cliente suscripto a `canales` (None = todos)."""
+        canales = set(canales) if canales is not None else None
+        position = self._resume_from(last_event_id) if last_event_id else None
+        lost = last_event_id is not None and position is None
+        with self._cond:
+            if position is None:
+                position = self._last
+            self.clients += 1
+        try:
+            yield f'retry: {RETRY_MS}\n\n'
+            if lost:
+                yield self._format(f'{self.epoch}-{position}', 'recargar', '{}')
+            while True:
+                with self._cond:
+                    self._cond.wait_for(lambda: self._last > position, timeout=self.keepalive)
+                    pending = [e for e in self._events if e[0] > position]
+                    if pending and pending[0][0] > position + 1:
+                        # El cliente quedó tan atrás que el historial ya descartó eventos suyos
+                        pending = [(self._last, None, 'recargar', '{}')]
+                    position = self._last
+                if not pending:
+                    yield ': keepalive\n\n'
+                    continue
+                sent = None
+                for n, canal, tipo, payload in pending:
+                    if canal is None or canales is None or canal in canales:
+                        yield self._format(f'{self.epoch}-{n}', tipo, payload)
+                        sent = n
+                if sent != position:
+                    # Un id sin datos no dispara un evento pero actualiza el Last-Event-ID del navegador,
+                    # así al reconectarse no vuelve a pedir eventos de otros cursos
+                    yield f'id: {self.epoch}-{position}\n\n'
+        finally:
+            with self._cond:
+                self.clients -= 1
+
+    @staticmethod
+    def _format(event_id, tipo, payload):
+        return f'id: {event_id}\nevent: {tipo}\ndata: {payload}\n\n'
@@ -0,0 +1,163 @@
+import threading
+import time
+from datetime import date
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from face_recognition.metrics import ATTENDANCE_POST_SECONDS, ATTENDANCE_SENT
+
+class AttendanceSender:
+    """
+    Envía los registros de asistencia en segundo plano para no frenar el bucle de video.
+
+    - submit() nunca bloquea: solo agrega el alumno a una cola en memoria.
+    - Los duplicados del mismo alumno en el mismo día se unifican (gana el último estado).
+    - Un hilo vacía la cola por lotes (/asistencias/registrar_lote) con una sesión HTTP keep-alive.
+    - Los envíos fallidos se reintentan con espera exponencial hasta max_retries veces.
+    - token, si se indica, viaja en el encabezado X-Registro-Token que exige el servidor.
+    """
+
+    def __init__(self, base_url, batch_size=20, flush_interval=0.5, max_retries=5,
+                 backoff=0.5, max_backoff=30, max_pending=1000, timeout=5, token=None):
+        self.base_url = base_url
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.max_pending = max_pending
+        self.timeout = timeout
+
+        self.session = requests.Session()
+        self.session.mount('http://', HTTPAdapter(pool_connections=1, pool_maxsize=4))
+        self.session.mount('https://', HTTPAdapter(pool_connections=1, pool_maxsize=4))
+        if token:
+            self.session.headers['X-Registro-Token'] = token
+
+        self._cond = threading.Condition()
+        self._pending = {} # (alumno_id, fecha) -> {'estado', 'intentos', 'no_antes_de'}
+        self._sent = {} # (alumno_id, fecha) -> estado ya registrado en el servidor
+        self._closed = False
+        self.stats = {'encolados': 0, 'unificados': 0, 'enviados': 0, 'reintentos': 0, 'descartados': 0}
+        self._thread = threading.Thread(target=self._run, name='attendance-sender', daemon=True)
+        self._thread.start()
+
+    def submit(self, alumno_id, estado="Presente"):
+        """Encola el registro de asistencia. Devuelve False si se unificó con uno existente o se descartó."""
+        key = (int(alumno_id), date.today())
+        with self._cond:
+            if self._sent.get(key) == estado:
+                self._count('unificados')
+                return False
+            if key in self._pending:
+                self._pending[key]['estado'] = estado
+                self._count('unificados')
+                return False
+            if len(self._pending) >= self.max_pending:
+                self._count('descartados')
+                print(f"[WARN] Cola de asistencias llena. Se descarta el registro del alumno ID {alumno_id}.")
+                return False
+            self._pending[key] = {'estado': estado, 'intentos': 0, 'no_antes_de': 0}
+            self._count('encolados')
+            self._cond.notify()
+            return True
+
+    def _count(self, key, amount=1):
+        # Se llama con self._cond tomado
+        self.stats[key] += amount
+        ATTENDANCE_SENT.inc(amount, resultado=key)
+
+    def close(self, timeout=10):
+        """Intenta enviar lo pendiente y detiene el hilo."""
+        with self._cond:
+            self._closed = True
+            self._cond.notify()
+        self._thread.join(timeout)
+        self.session.close()
+
+    def _take_batch(self):
+        # Espera hasta tener registros listos para enviar (o hasta que se cierre el sender)
+        waited = False
+        with self._cond:
+            while True:
+                now = time.monotonic()
+                ready = [key for key, item in self._pending.items() if item['no_antes_de'] <= now]
+                if ready:
+                    # Dar un margen para que se junte un lote completo, salvo que ya esté lleno o se esté cerrando
+                    if len(ready) < self.batch_size and not self._closed and not waited:
+                        waited = True
+                        self._cond.wait(self.flush_interval)
+                        continue
+                    return [(key, self._pending.pop(key)) for key in ready[:self.batch_size]]
+                if self._closed:
+                    return None
+                waits = [item['no_antes_de'] - now for item in self._pending.values()]
+                self._cond.wait(min(waits) if waits else None)
+
+    def _run(self):
+        while True:
+            batch = self._take_batch()
+            if batch is None:
+                return
+            self._send_batch(batch)
+
+    def _send_batch(self, batch):
+        payload = [{'alumno_id': alumno_id, 'fecha': fecha.isoformat(), 'estado': item['estado']}
+                   for (alumno_id, fecha), item in batch]
+        start = time.perf_counter()
+        try:
+            response = self.session.post(f"{self.base_url}/asistencias/registrar_lote", json=payload,
+                                         timeout=self.timeout)
+            ATTENDANCE_POST_SECONDS.observe(time.perf_counter() - start, resultado=response.status_code)
+            response.raise_for_status() # Lanza un error para códigos de estado HTTP erróneos
+            body = response.json()
+            resultados = body['resultados']
+        except requests.exceptions.HTTPError as e:
+            if e.response is not None and e.response.status_code < 500:
+                # Un error del cliente no se arregla reintentando
+                print(f"Error al registrar un lote de {len(batch)} asistencias: {e}")
+                with self._cond:
+                    self._count('descartados', len(batch))
+            else:
+                for key, item in batch:
+                    self._retry(key, item, e)
+            return
+        except (requests.exceptions.RequestException, ValueError, KeyError) as e:
+            if isinstance(e, requests.exceptions.RequestException):
+                ATTENDANCE_POST_SECONDS.observe(time.perf_counter() - start, resultado='sin_respuesta')
+            for key, item in batch:
+                self._retry(key, item, e)
+            return
+
+        with self._cond:
+            for (key, item), resultado in zip(batch, resultados):
+                if resultado['resultado'] == 'error':
+                    print(f"Error al registrar asistencia para el alumno ID {key[0]}: {resultado.get('error')}")
+                    self._count('descartados')
+                else:
+                    self._sent[key] = item['estado']
+                    self._count('enviados')
+        print(f"Lote de {len(batch)} asistencias enviado: {body.get('resumen')}")
+        self._forget_old_days(date.today())
+
+    def _retry(self, key, item, error):
+        item['intentos'] += 1
+        if item['intentos'] > self.max_retries:
+            print(f"Error al registrar asistencia para el alumno ID {key[0]}: {error}. Se descarta tras {self.max_retries} reintentos.")
+            with self._cond:
+                self._count('descartados')
+            return
+        delay = min(self.max_backoff, self.backoff * 2 ** (item['intentos'] - 1))
+        print(f"Error al registrar asistencia para el alumno ID {key[0]}: {error}. Reintento en {delay:.1f}s.")
+        item['no_antes_de'] = time.monotonic() + delay
+        with self._cond:
+            self._count('reintentos')
+            # Si mientras tanto llegó un estado más nuevo para la misma clave, ese tiene prioridad
+            self._pending.setdefault(key, item)
+            self._cond.notify()
+
+    def _forget_old_days(self, today):
+        with self._cond:
+            for key in [k for k in self._sent if k[1] != today]:
+                del self._sent[key]
@@ -0,0 +1,192 @@
+import argparse
+import json
+import os
+import time
+from datetime import datetime
+
+import cv2
+import numpy as np
+
+from face_recognition import face_recognizer
+from face_recognition.dataset_loader import parse_sample_label
+from face_recognition.face_quality import normalize_face
+from face_recognition.face_tracking import FaceTracker
+from face_recognition.model_store import wrap_recognizer
+from face_recognition.sample_store import has_store
+from face_recognition.video_sources import open_source, source_name, IMAGE_EXTENSIONS
+
+try:
+    import resource
+except ImportError: # Windows
+    resource = None
+
+PERCENTILES = (50, 95, 99)
+
+def _peak_rss_mb():
+    if resource is None:
+        return None
+    # ru_maxrss está en KB en Linux
+    return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+
+def _latency_summary(values):
+    if not values:
+        return None
+    p = np.percentile(np.array(values) * 1000, PERCENTILES)
+    return {f'p{q}_ms': round(float(v), 3) for q, v in zip(PERCENTILES, p)} | {'n': len(values)}
+
+def parse_source(spec):
+    """
+    'ruta' o 'ruta@ID'. ID es el alumno que aparece en la fuente (-1 para personas no registradas).
+    Para directorios de datasets/<id> la etiqueta se toma del nombre del directorio.
+    """
+    path, _, label = spec.rpartition('@') if '@' in spec else (spec, '', '')
+    if label:
+        return path, int(label)
+    name = os.path.basename(os.path.normpath(path))
+    return path, int(name) if name.isdigit() and os.path.isdir(path) else None
+
+def _is_crop_directory(path):
+    # Los directorios de datasets ya contienen recortes de rostros: no hay nada que detectar
+    if not os.path.isdir(path):
+        return False
+    if has_store(path):
+        return True
+    files = [f for f in os.listdir(path) if f.lower().endswith(IMAGE_EXTENSIONS)]
+    return bool(files) and all(parse_sample_label(f) is not None for f in files)
+
+def benchmark_source(path, label, recognizer, threshold, detection_options=None, crops=None):
+    """Procesa una fuente completa y devuelve sus métricas."""
+    crops = _is_crop_directory(path) if crops is None else crops
+    cap = open_source(path)
+    if not cap.isOpened():
+        return {'error': f'No se pudo abrir la fuente de video {path}'}
+    tracker = None if crops else FaceTracker(**(detection_options or {}))
+
+    latencias = {'captura': [], 'deteccion': [], 'prediccion': [], 'total': []}
+    conteo = {'frames': 0, 'rostros': 0, 'aciertos': 0, 'falsos_aceptados': 0, 'falsos_rechazados': 0}
+    start = time.perf_counter()
+    while True:
+        t0 = time.perf_counter()
+        ret, frame = cap.read()
+        if not ret:
+            break
+        t1 = time.perf_counter()
+        gray = frame if frame.ndim == 2 else cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        if crops:
+            boxes = [(0, 0, gray.shape[1], gray.shape[0])]
+        else:
+            boxes = [tracker.box_of(track) for track in tracker.update(gray)]
+        t2 = time.perf_counter()
+        for (x, y, w, h) in boxes:
+            p0 = time.perf_counter()
+            id_predicted, confidence = recognizer.predict(normalize_face(gray[y:y+h, x:x+w]))
+            latencias['prediccion'].append(time.perf_counter() - p0)
+            conteo['rostros'] += 1
+            if label is None:
+                continue
+            accepted = confidence < threshold
+            if accepted and id_predicted == label:
+                conteo['aciertos'] += 1
+            elif accepted:
+                conteo['falsos_aceptados'] += 1
+            elif label >= 0:
+                conteo['falsos_rechazados'] += 1
+            else:
+                conteo['aciertos'] += 1 # Persona no registrada correctamente rechazada
+        t3 = time.perf_counter()
+        latencias['captura'].append(t1 - t0)
+        latencias['deteccion'].append(t2 - t1)
+        latencias['total'].append(t3 - t0)
+        conteo['frames'] += 1
+    elapsed = time.perf_counter() - start
+    cap.release()
+
+    result = dict(conteo)
+    result['fuente'] = path
+    result['etiqueta'] = label
+    result['recortes'] = crops
+    result['segundos'] = round(elapsed, 3)
+    result['fps'] = round(conteo['frames'] / elapsed, 2) if elapsed > 0 else 0.0
+    result['latencias'] = {stage: _latency_summary(values) for stage, values in latencias.items()}
+    if label is not None and conteo['rostros']:
+        result['exactitud'] = round(conteo['aciertos'] / conteo['rostros'], 4)
+        result['tasa_falsa_aceptacion'] = round(conteo['falsos_aceptados'] / conteo['rostros'], 4)
+    return result
+
+def run_benchmark(sources=None, threshold=60, detection_options=None, output=None, engine='auto'):
+    """
+    Corre el benchmark sobre las fuentes dadas ('ruta' o 'ruta@ID'); sin fuentes usa cada
+    directorio de datasets/<id>. Si output es una ruta, guarda ahí el resultado en JSON.
+    engine elige el motor de comparación: 'opencv', 'numpy' (LBPHMatcher) o 'auto'.
+    """
+    if not sources:
+        sources = sorted(os.path.join(face_recognizer.datasets_path, d) for d in os.listdir(face_recognizer.datasets_path)
+                         if os.path.isdir(os.path.join(face_recognizer.datasets_path, d)))
+
+    load_start = time.perf_counter()
+    model = face_recognizer.load_recognizer()
+    if model is None:
+        return None
+    recognizer = wrap_recognizer(model, engine)
+    load_seconds = time.perf_counter() - load_start
+
+    fuentes = {}
+    for i, spec in enumerate(sources):
+        path, label = parse_source(spec)
+        name = source_name(path)
+        if name in fuentes:
+            name = f'{name}-{i}' # Dos fuentes con el mismo nombre corto
+        print(f"[INFO] Benchmark de {path}...")
+        fuentes[name] = benchmark_source(path, label, recognizer, threshold, detection_options)
+
+    total = {k: sum(f.get(k, 0) for f in fuentes.values())
+             for k in ('frames', 'rostros', 'aciertos', 'falsos_aceptados', 'falsos_rechazados')}
+    segundos = sum(f.get('segundos', 0) for f in fuentes.values())
+    total['fps'] = round(total['frames'] / segundos, 2) if segundos else 0.0
+    evaluados = sum(f['rostros'] for f in fuentes.values() if f.get('etiqueta') is not None)
+    if evaluados:
+        total['exactitud'] = round(total['aciertos'] / evaluados, 4)
+        total['tasa_falsa_aceptacion'] = round(total['falsos_aceptados'] / evaluados, 4)
+
+    labels = model.getLabels()
+    result = {
+        'fecha': datetime.now().isoformat(timespec='seconds'),
+        'configuracion': {'threshold': threshold, 'deteccion': detection_options or {},
+                          'motor': type(recognizer).__name__},
+        'modelo': {
+            'ruta': face_recognizer.trainer_path,
+            'bytes': os.path.getsize(face_recognizer.trainer_path),
+            'histogramas': len(labels) if labels is not None else 0,
+            'alumnos': int(len(np.unique(labels))) if labels is not None else 0,
+            'segundos_carga': round(load_seconds, 3),
+        },
+        'fuentes': fuentes,
+        'total': total,
+        'pico_rss_mb': _peak_rss_mb(),
+    }
+    if output:
+        with open(output, 'w') as f:
+            json.dump(result, f, indent=2)
+        print(f"[INFO] Resultados guardados en {output}")
+    return result
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark offline del reconocimiento facial.')
+    parser.add_argument('fuentes', nargs='*', help="Videos o directorios de imágenes, opcionalmente 'ruta@ID_ALUMNO'.")
+    parser.add_argument('--threshold', type=float, default=60)
+    parser.add_argument('--escala', type=float, default=None, help='Escala del frame para la detección.')
+    parser.add_argument('--intervalo', type=int, default=None, help='Cada cuántos frames correr el detector.')
+    parser.add_argument('--tamano-minimo', type=int, default=None, help='Lado mínimo del rostro en píxeles.')
+    parser.add_argument('--motor', choices=('auto', 'opencv', 'numpy'), default='auto',
+                        help='Motor de comparación de histogramas.')
+    parser.add_argument('--salida', default='bench_recognition.json', help='Archivo JSON de resultados.')
+    args = parser.parse_args(argv)
+    detection_options = {k: v for k, v in (('scale', args.escala), ('detection_interval', args.intervalo),
+                                           ('min_face_size', args.tamano_minimo)) if v is not None}
+    result = run_benchmark(args.fuentes, args.threshold, detection_options, args.salida, args.motor)
+    if result is not None:
+        print(json.dumps(result['total'], indent=2))
+
+if __name__ == '__main__':
+    # Ejemplo: python -m face_recognition.benchmark face_recognition/datasets/1 videos/puerta.mp4@3
+    main()
@@ -0,0 +1,145 @@
+import itertools
+import os
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+
+import cv2
+
+from face_recognition.face_quality import normalize_face
+from face_recognition.sample_store import SampleStore, parse_sample_key
+
+# Nombre válido de una muestra: user_<id>_<n>.jpg
+SAMPLE_NAME_RE = re.compile(r'^user_(\d+)_(\d+)\.jpg$')
+
+# Cantidad máxima de muestras que se entregan juntas al entrenador
+CHUNK_SIZE = 500
+
+def parse_sample_label(image_path):
+    """
+    Devuelve el ID del alumno codificado en el nombre del archivo, o None si el nombre no es válido.
+    """
+    match = SAMPLE_NAME_RE.match(os.path.basename(image_path))
+    return int(match.group(1)) if match else None
+
+def _decode_directory(directory, image_paths):
+    """
+    Decodifica en escala de grises las imágenes de un directorio de alumno y las lleva a FACE_SIZE,
+    el tamaño con el que se comparan los rostros al reconocer (los recortes JPEG de capturas
+    anteriores tienen el tamaño del rostro detectado). Se ejecuta dentro de un proceso del pool, por eso no imprime ni lanza excepciones por archivo.
+    """
+    start = time.perf_counter()
+    faces = []
+    ids = []
+    skipped = []
+    for image_path in image_paths:
+        label = parse_sample_label(image_path)
+        if label is None:
+            skipped.append((image_path, 'nombre inválido'))
+            continue
+        img = cv2.imread(image_path, cv2.IMREAD_GRAYSCALE)
+        if img is None or img.size == 0:
+            skipped.append((image_path, 'imagen ilegible'))
+            continue
+        faces.append(normalize_face(img))
+        ids.append(label)
+    return directory, faces, ids, skipped, time.perf_counter() - start
+
+def _read_packed(directory, keys):
+    """
+    Lee muestras empaquetadas (claves <directorio>/samples.u8#<n>) de un almacén. Las muestras son
+    vistas del memmap: no se copian ni decodifican, así que no hace falta un pool de procesos.
+    """
+    start = time.perf_counter()
+    store = SampleStore(directory)
+    samples = store.load()
+    faces = []
+    ids = []
+    skipped = []
+    for key in keys:
+        n = parse_sample_key(key)[1]
+        if n >= len(store):
+            skipped.append((key, 'muestra inexistente'))
+            continue
+        faces.append(samples[n])
+        ids.append(int(store.index['label'][n]))
+    return directory, faces, ids, skipped, time.perf_counter() - start
+
+def _group_by_directory(image_paths):
+    groups = {}
+    for image_path in image_paths:
+        groups.setdefault(os.path.dirname(image_path), []).append(image_path)
+    return groups
+
+def _iter_decoded(groups, max_workers):
+    max_workers = max_workers or os.cpu_count() or 1
+    # Con un solo directorio no vale la pena levantar procesos
+    if max_workers == 1 or len(groups) <= 1:
+        for directory, paths in groups.items():
+            yield _decode_directory(directory, paths)
+        return
+
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        pending = iter(groups.items())
+        in_flight = set()
+        # Se mantienen como máximo 2 directorios por proceso en vuelo para acotar la memoria
+        limit = 2 * max_workers
+        while True:
+            for directory, paths in pending:
+                in_flight.add(executor.submit(_decode_directory, directory, paths))
+                if len(in_flight) >= limit:
+                    break
+            if not in_flight:
+                return
+            done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                yield future.result()
+
+def iter_sample_chunks(image_paths, chunk_size=CHUNK_SIZE, max_workers=None, report=None):
+    """
+    Decodifica las imágenes agrupadas por directorio de alumno en un pool de procesos y
+    entrega tuplas (faces, ids) de a lo sumo chunk_size muestras. Las claves de muestras
+    empaquetadas (ver sample_store) se leen directamente del memmap de su almacén.
+
+    Los archivos con nombre inválido o que no se pueden leer se omiten sin cortar la carga.
+    Si se pasa un dict en report, se completa con 'cargadas', 'omitidas' y el detalle por directorio.
+    """
+    if report is None:
+        report = {}
+    report.setdefault('cargadas', 0)
+    report.setdefault('omitidas', [])
+    report.setdefault('directorios', {})
+
+    packed_groups = {}
+    file_groups = {}
+    for directory, paths in _group_by_directory(image_paths).items():
+        for path in paths:
+            groups = packed_groups if parse_sample_key(path) else file_groups
+            groups.setdefault(directory, []).append(path)
+    decoded = itertools.chain((_read_packed(directory, keys) for directory, keys in packed_groups.items()),
+                              _iter_decoded(file_groups, max_workers))
+
+    faces_chunk = []
+    ids_chunk = []
+    for directory, faces, ids, skipped, elapsed in decoded:
+        alumno_id_dir = os.path.basename(directory)
+        print(f"Cargadas {len(faces)} imágenes para el alumno ID: {alumno_id_dir} en {elapsed:.2f}s"
+              + (f" ({len(skipped)} omitidas)" if skipped else ""))
+        for image_path, motivo in skipped:
+            print(f"[WARN] Se omite {image_path}: {motivo}")
+        report['cargadas'] += len(faces)
+        report['omitidas'].extend(path for path, _ in skipped)
+        detail = report['directorios'].setdefault(alumno_id_dir, {'cargadas': 0, 'omitidas': 0, 'segundos': 0.0})
+        detail['cargadas'] += len(faces)
+        detail['omitidas'] += len(skipped)
+        detail['segundos'] += elapsed
+
+        faces_chunk.extend(faces)
+        ids_chunk.extend(ids)
+        while len(faces_chunk) >= chunk_size:
+            yield faces_chunk[:chunk_size], ids_chunk[:chunk_size]
+            faces_chunk = faces_chunk[chunk_size:]
+            ids_chunk = ids_chunk[chunk_size:]
+
+    if faces_chunk:
+        yield faces_chunk, ids_chunk
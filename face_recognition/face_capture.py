@@ -1,51 +1,88 @@
 import cv2
 import os
 
-def capture_faces(alumno_id, num_fotos=50):
-    # Cargar el clasificador de rostros pre-entrenado de OpenCV
-    face_detector = cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_frontalface_default.xml')
+from face_recognition.face_quality import FaceQualityGate
+from face_recognition.face_tracking import FaceTracker
+from face_recognition.metrics import CAPTURE_SAMPLES, CAPTURE_REJECTED
+from face_recognition.sample_store import SampleStore, has_store, convert_directory
+from face_recognition.video_sources import open_source
+
+def capture_faces(alumno_id, num_fotos=50, progress=None, cancel_event=None, detection_options=None, source=0,
+                  quality_options=None, display=True):
+    """
+    Captura num_fotos rostros del alumno desde la cámara (o la fuente de video indicada en source).
+    progress(frames=..., capturadas=..., rechazos=...) recibe el avance y cancel_event (threading.Event) permite cortar la captura.
+    detection_options se pasa a FaceTracker (scale, detection_interval, min_face_size, ...).
+
+    Solo se guardan los frames con un único rostro, suficientemente grande y nítido, y distinto de
+    los ya guardados; el rostro se guarda alineado y en tamaño fijo. quality_options se pasa a
+    FaceQualityGate (min_size, min_sharpness, hash_distance). display=False evita abrir la ventana de
+    OpenCV (servidor sin pantalla) y no espera entre frames.
+
+    Los rostros se agregan al almacén empaquetado del alumno (datasets/<id>/samples.u8); si el
+    alumno tenía imágenes JPEG de antes, primero se empaquetan para no perderlas.
+    """
+    # Detector de rostros reducido, con seguimiento entre detecciones
+    tracker = FaceTracker(**(detection_options or {}))
 
     # Crear la carpeta para el alumno si no existe
     dataset_path = f'./face_recognition/datasets/{alumno_id}'
     if not os.path.exists(dataset_path):
         os.makedirs(dataset_path)
+    if not has_store(dataset_path):
+        convert_directory(dataset_path)
+    store = SampleStore(dataset_path)
+    # Las muestras que el alumno ya tiene también cuentan como duplicados
+    gate = FaceQualityGate(**(quality_options or {}), hashes=store.index['hash'])
 
     # Inicializar la cámara
-    cap = cv2.VideoCapture(0) # 0 para la cámara predeterminada
+    cap = open_source(source) # 0 para la cámara predeterminada
     if not cap.isOpened():
-        print("Error: No se pudo abrir la cámara.")
+        print(f"Error: No se pudo abrir la fuente de video {source}.")
         return False
 
     print(f"\n[INFO] Capturando {num_fotos} imágenes para el alumno ID: {alumno_id}. Presiona 'q' para salir.")
     count = 0
-    while True:
+    frames = 0
+    while cancel_event is None or not cancel_event.is_set():
         ret, frame = cap.read()
         if not ret:
             print("Error al leer el frame de la cámara.")
             break
 
+        frames += 1
         gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-        faces = face_detector.detectMultiScale(gray, 1.3, 5)
+        faces = [tracker.box_of(track) for track in tracker.update(gray)]
 
-        for (x, y, w, h) in faces:
+        for (x, y, w, h) in faces if display else ():
             cv2.rectangle(frame, (x, y), (x + w, y + h), (255, 0, 0), 2)
-            
-            # Solo guardar si se detecta un rostro y no hemos alcanzado el límite de fotos
-            if count < num_fotos:
-                img_name = f"{dataset_path}/user_{alumno_id}_{count}.jpg"
-                cv2.imwrite(img_name, gray[y:y+h, x:x+w])
-                count += 1
-                print(f"Imagen {count}/{num_fotos} capturada.")
-
-        cv2.imshow('Capturando Rostros', frame)
-
-        k = cv2.waitKey(100) & 0xff # Espera 100ms, si se presiona 'q' sale
-        if k == ord('q') or count >= num_fotos:
+
+        face = gate.check(gray, faces)
+        # Solo guardar si el rostro pasó los controles de calidad y no hemos alcanzado el límite de fotos
+        if face is not None and count < num_fotos:
+            store.append([face], alumno_id, qualities=[gate.last_quality], hashes=[gate.last_hash])
+            count += 1
+            print(f"Imagen {count}/{num_fotos} capturada.")
+
+        if progress:
+            progress(frames=frames, capturadas=count, total=num_fotos, rechazos=dict(gate.rechazos))
+
+        if count >= num_fotos:
             break
+        if display:
+            cv2.imshow('Capturando Rostros', frame)
+            k = cv2.waitKey(100) & 0xff # Espera 100ms, si se presiona 'q' sale
+            if k == ord('q'):
+                break
 
     cap.release()
-    cv2.destroyAllWindows()
-    print(f"\n[INFO] Captura de rostros finalizada para el alumno ID: {alumno_id}. Total: {count} imágenes.")
+    if display:
+        cv2.destroyAllWindows()
+    CAPTURE_SAMPLES.inc(count)
+    for reason, n in gate.rechazos.items():
+        CAPTURE_REJECTED.inc(n, motivo=reason)
+    print(f"\n[INFO] Captura de rostros finalizada para el alumno ID: {alumno_id}. Total: {count} imágenes. "
+          f"Descartadas: {gate.rechazos}")
     return True
 
 if __name__ == '__main__':
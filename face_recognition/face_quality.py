@@ -0,0 +1,104 @@
+import math
+
+import cv2
+import numpy as np
+
+FACE_SIZE = (200, 200) # Tamaño (ancho, alto) con el que se guardan y comparan los rostros
+MIN_CAPTURE_SIZE = 100 # Lado mínimo, en píxeles del frame, de un rostro que se guarda en el dataset
+MIN_SHARPNESS = 15.0 # Varianza del laplaciano mínima (medida sobre el rostro en FACE_SIZE)
+HASH_DISTANCE = 6 # Bits distintos del dHash de 64 bits por debajo de los cuales dos rostros son casi iguales
+
+_eye_detector = None
+
+def _get_eye_detector():
+    global _eye_detector
+    if _eye_detector is None:
+        _eye_detector = cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_eye.xml')
+    return _eye_detector
+
+def normalize_face(face_gray):
+    """Lleva un recorte de rostro al tamaño fijo FACE_SIZE."""
+    if face_gray.shape[1::-1] == FACE_SIZE:
+        return face_gray
+    return cv2.resize(face_gray, FACE_SIZE, interpolation=cv2.INTER_AREA)
+
+def align_face(gray, box):
+    """
+    Recorta el rostro de `box` con los ojos horizontales y lo devuelve en FACE_SIZE.
+    Si no se encuentran los dos ojos en la mitad superior del rostro, solo se recorta.
+    """
+    x, y, w, h = box
+    face = gray[y:y+h, x:x+w]
+    eyes = _get_eye_detector().detectMultiScale(face[:h // 2], 1.1, 5, minSize=(w // 8, h // 8))
+    if len(eyes) >= 2:
+        # Los dos ojos más grandes, ordenados de izquierda a derecha
+        eyes = sorted(sorted(eyes, key=lambda e: e[2] * e[3], reverse=True)[:2], key=lambda e: e[0])
+        (lx, ly, lw, lh), (rx, ry, rw, rh) = eyes
+        left = (x + lx + lw / 2, y + ly + lh / 2)
+        right = (x + rx + rw / 2, y + ry + rh / 2)
+        angle = math.degrees(math.atan2(right[1] - left[1], right[0] - left[0]))
+        if abs(angle) <= 30: # Más inclinado que eso probablemente sea una detección errónea
+            center = ((left[0] + right[0]) / 2, (left[1] + right[1]) / 2)
+            rotation = cv2.getRotationMatrix2D(center, angle, 1.0)
+            rotated = cv2.warpAffine(gray, rotation, gray.shape[1::-1], flags=cv2.INTER_LINEAR,
+                                     borderMode=cv2.BORDER_REPLICATE)
+            face = rotated[y:y+h, x:x+w]
+    return normalize_face(face)
+
+def sharpness(face_gray):
+    """Nitidez como varianza del laplaciano; las imágenes movidas o desenfocadas dan valores bajos."""
+    return cv2.Laplacian(normalize_face(face_gray), cv2.CV_64F).var()
+
+def dhash(face_gray):
+    """Hash perceptual de diferencias (64 bits): rostros casi iguales dan hashes a pocos bits de distancia."""
+    small = cv2.resize(face_gray, (9, 8), interpolation=cv2.INTER_AREA)
+    bits = (small[:, 1:] > small[:, :-1]).ravel()
+    return int(np.packbits(bits).view('>u8')[0])
+
+def hamming(a, b):
+    return bin(a ^ b).count('1')
+
+class FaceQualityGate:
+    """
+    Decide qué rostros de la captura vale la pena guardar.
+
+    Rechaza frames sin rostro o con más de uno, rostros chicos o borrosos y los que son casi
+    iguales (por dHash) a alguno ya guardado (o a los de hashes, p. ej. de capturas anteriores).
+    check() devuelve el rostro alineado en FACE_SIZE o None, y deja su nitidez y hash en
+    last_quality y last_hash; rechazos cuenta los descartes por motivo.
+    """
+
+    def __init__(self, min_size=MIN_CAPTURE_SIZE, min_sharpness=MIN_SHARPNESS, hash_distance=HASH_DISTANCE,
+                 hashes=()):
+        self.min_size = min_size
+        self.min_sharpness = min_sharpness
+        self.hash_distance = hash_distance
+        self.hashes = [int(h) for h in hashes]
+        self.last_quality = None
+        self.last_hash = None
+        self.rechazos = {'sin_rostro': 0, 'varios_rostros': 0, 'pequeno': 0, 'borroso': 0, 'duplicado': 0}
+
+    def check(self, gray, boxes):
+        if not boxes:
+            return self._reject('sin_rostro')
+        if len(boxes) > 1:
+            # No se puede saber cuál de los rostros es el del alumno
+            return self._reject('varios_rostros')
+        x, y, w, h = boxes[0]
+        if min(w, h) < self.min_size:
+            return self._reject('pequeno')
+        quality = sharpness(gray[y:y+h, x:x+w])
+        if quality < self.min_sharpness:
+            return self._reject('borroso')
+        face = align_face(gray, boxes[0])
+        face_hash = dhash(face)
+        if any(hamming(face_hash, h) < self.hash_distance for h in self.hashes):
+            return self._reject('duplicado')
+        self.hashes.append(face_hash)
+        self.last_quality = quality
+        self.last_hash = face_hash
+        return face
+
+    def _reject(self, reason):
+        self.rechazos[reason] += 1
+        return None
@@ -1,30 +1,137 @@
 import cv2
 import os
+import json
+import threading
+import time
 import numpy as np
-from PIL import Image
 import requests # Agregado para hacer peticiones HTTP
 
+from face_recognition.attendance_sender import AttendanceSender
+from face_recognition.dataset_loader import iter_sample_chunks, parse_sample_label
+from face_recognition.face_quality import normalize_face
+from face_recognition.face_tracking import FaceTracker, DETECTION_INTERVAL
+from face_recognition.identity_cache import IdentityCache, UNKNOWN
+from face_recognition.metrics import TRAINING_SECONDS, TRAINING_IMAGES, TRAINING_THROUGHPUT
+from face_recognition.model_store import ModelHolder
+from face_recognition.pipeline import FramePipeline, StageStats
+from face_recognition.sample_store import SampleStore, has_store, sample_key, STORE_FILES
+from face_recognition.video_sources import open_source, source_name, is_live_source
+
 # Rutas
 datasets_path = './face_recognition/datasets'
 trainer_path = './face_recognition/trainer/trainer.yml'
+# Manifiesto de muestras ya entrenadas (ruta -> mtime, etiqueta), junto a trainer.yml
+manifest_path = './face_recognition/trainer/manifest.json'
+MANIFEST_VERSION = 2 # 2: las muestras JPEG se entrenan en FACE_SIZE
 
-# URL base de la API de Flask
-FLASK_API_BASE_URL = "http://127.0.0.1:5000"
+# URL base de la API de Flask a la que se envían las asistencias; con el perfil 'web' es la del
+# servidor web, no la del worker de visión
+FLASK_API_BASE_URL = os.environ.get('ASISTENCIA_API_URL', "http://127.0.0.1:5000")
+# Token para /asistencias/registrar_lote; debe coincidir con REGISTRO_TOKEN del servidor
+REGISTRO_TOKEN = os.environ.get('ASISTENCIA_REGISTRO_TOKEN')
 
 def get_images_and_labels(path):
     image_paths = [os.path.join(path, f) for f in os.listdir(path) if not f.startswith('.')]
     face_samples = []
     ids = []
-    for image_path in image_paths:
-        PIL_img = Image.open(image_path).convert('L') # Convertir a escala de grises
-        img_numpy = np.array(PIL_img, 'uint8')
-        # Extraer el ID del alumno del nombre del archivo (user_ID_numero.jpg)
-        id = int(os.path.split(image_path)[-1].split('_')[1])
-        face_samples.append(img_numpy)
-        ids.append(id)
+    for faces, labels in iter_sample_chunks(image_paths, max_workers=1):
+        face_samples.extend(faces)
+        ids.extend(labels)
     return face_samples, ids
 
-def train_recognizer():
+def _scan_dataset():
+    """
+    Recorre datasets_path y devuelve {ruta: {'mtime': ..., 'label': ...}} sin decodificar imágenes.
+    En los directorios con almacén empaquetado la ruta es la clave de cada muestra y sus JPEG se ignoran.
+    """
+    samples = {}
+    for alumno_id_dir in os.listdir(datasets_path):
+        current_alumno_path = os.path.join(datasets_path, alumno_id_dir)
+        if not os.path.isdir(current_alumno_path): # Asegurarse de que sea un directorio
+            continue
+        if has_store(current_alumno_path):
+            index = SampleStore(current_alumno_path).index
+            for n, (label, timestamp) in enumerate(zip(index['label'].tolist(), index['timestamp'].tolist())):
+                samples[sample_key(current_alumno_path, n)] = {'mtime': timestamp, 'label': label}
+            continue
+        for f in os.listdir(current_alumno_path):
+            if f.startswith('.') or f in STORE_FILES:
+                continue
+            image_path = os.path.join(current_alumno_path, f)
+            # Extraer el ID del alumno del nombre del archivo (user_ID_numero.jpg)
+            label = parse_sample_label(image_path)
+            if label is None:
+                print(f"[WARN] Se omite {image_path}: nombre inválido")
+                continue
+            samples[image_path] = {'mtime': os.path.getmtime(image_path), 'label': label}
+    return samples
+
+def _load_manifest():
+    """
+    Devuelve las muestras del manifiesto, o None si no existe o no corresponde al trainer.yml actual.
+    """
+    if not os.path.exists(manifest_path) or not os.path.exists(trainer_path):
+        return None
+    try:
+        with open(manifest_path) as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return None
+    # El manifiesto está obsoleto si el modelo fue reescrito por fuera de train_recognizer
+    if manifest.get('version') != MANIFEST_VERSION or manifest.get('trainer_mtime') != os.path.getmtime(trainer_path):
+        return None
+    return manifest.get('samples', {})
+
+def _save_manifest(samples):
+    tmp_path = f'{manifest_path}.{os.getpid()}.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump({
+            'version': MANIFEST_VERSION,
+            'trainer_mtime': os.path.getmtime(trainer_path),
+            'samples': samples,
+        }, f)
+    os.replace(tmp_path, manifest_path)
+
+def _write_model(recognizer):
+    """
+    Escribe el modelo en un archivo temporal y lo renombra sobre trainer.yml: quien esté leyendo
+    el modelo ve el archivo anterior completo o el nuevo completo, nunca uno a medio escribir.
+    """
+    # OpenCV elige el formato por la extensión, así que el temporal también termina en .yml
+    tmp_path = os.path.join(os.path.dirname(trainer_path), f'.trainer.{os.getpid()}.tmp.yml')
+    try:
+        recognizer.write(tmp_path)
+        os.replace(tmp_path, trainer_path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+def _feed_recognizer(recognizer, image_paths, update, progress=None, cancel_event=None):
+    """
+    Pasa las muestras al reconocedor por bloques para no tener todo el dataset en memoria.
+    El primer bloque usa train() salvo que se esté actualizando un modelo existente.
+    """
+    report = {'cancelado': False}
+    for faces, ids in iter_sample_chunks(image_paths, report=report):
+        if cancel_event is not None and cancel_event.is_set():
+            report['cancelado'] = True
+            break
+        if update:
+            recognizer.update(faces, np.array(ids))
+        else:
+            recognizer.train(faces, np.array(ids))
+            update = True
+        if progress:
+            progress(imagenes_cargadas=report['cargadas'], imagenes_total=len(image_paths))
+    return report
+
+def train_recognizer(incremental=True, progress=None, cancel_event=None):
+    """
+    Entrena el reconocedor LBPH. En modo incremental carga el modelo existente y solo le pasa
+    a recognizer.update() las muestras nuevas según el manifiesto; se reconstruye desde cero si
+    se borraron o modificaron muestras, si el manifiesto está obsoleto o si incremental=False.
+    Si cancel_event se activa durante la carga, el modelo en disco no se modifica.
+    """
     # Crear el entrenador LBPH
     recognizer = cv2.face.LBPHFaceRecognizer_create()
     
@@ -34,39 +141,106 @@ def train_recognizer():
         os.makedirs(trainer_dir)
 
     print("\n[INFO] Entrenando rostros. Esto puede tomar unos segundos...")
-    
-    all_face_samples = []
-    all_ids = []
 
     # Recorrer todos los subdirectorios (IDs de alumnos) en datasets_path
     if not os.path.exists(datasets_path):
         print(f"[INFO] El directorio de datasets '{datasets_path}' no existe. Asegúrate de capturar rostros primero.")
         return False
 
-    for alumno_id_dir in os.listdir(datasets_path):
-        current_alumno_path = os.path.join(datasets_path, alumno_id_dir)
-        if os.path.isdir(current_alumno_path): # Asegurarse de que sea un directorio
-            print(f"Cargando imágenes para el alumno ID: {alumno_id_dir}")
-            faces, ids = get_images_and_labels(current_alumno_path)
-            all_face_samples.extend(faces)
-            all_ids.extend(ids)
-
-    if not all_face_samples:
+    current_samples = _scan_dataset()
+    if not current_samples:
         print("[INFO] No hay datos para entrenar. Asegúrate de haber capturado rostros.")
         return False
 
-    # Entrenar el reconocedor
-    recognizer.train(all_face_samples, np.array(all_ids))
+    start = time.perf_counter()
+    trained_samples = _load_manifest() if incremental else None
+    mode = 'completo'
+    # update() solo agrega histogramas: una muestra borrada o reescrita (misma ruta, otro mtime o
+    # etiqueta) dejaría el histograma viejo en el modelo, así que en ese caso se reconstruye
+    stale = None
+    if trained_samples is not None:
+        stale = [path for path, info in trained_samples.items()
+                 if path not in current_samples or current_samples[path]['mtime'] != info['mtime']
+                 or current_samples[path]['label'] != info['label']]
+    if trained_samples is not None and not stale:
+        pending = [path for path in current_samples if path not in trained_samples]
+        if not pending:
+            print("[INFO] El modelo ya está actualizado. No hay muestras nuevas.")
+            return True
+        print(f"[INFO] Entrenamiento incremental: {len(pending)} muestras nuevas.")
+        mode = 'incremental'
+        recognizer.read(trainer_path)
+        report = _feed_recognizer(recognizer, pending, True, progress, cancel_event)
+        if report['cancelado']:
+            print("[INFO] Entrenamiento cancelado. El modelo no se modificó.")
+            return False
+        if report['cargadas'] == 0:
+            print("[INFO] Ninguna de las muestras nuevas se pudo cargar. El modelo no se modificó.")
+            return True
+    else:
+        if trained_samples is not None:
+            print(f"[INFO] {len(stale)} muestras se eliminaron o modificaron desde el último entrenamiento. "
+                  "Reentrenando desde cero.")
+        # Entrenar el reconocedor
+        report = _feed_recognizer(recognizer, list(current_samples), False, progress, cancel_event)
+
+    if report['cancelado']:
+        print("[INFO] Entrenamiento cancelado. El modelo no se modificó.")
+        return False
+    if report['cargadas'] == 0:
+        print("[INFO] No se pudo cargar ninguna imagen válida. El modelo no se modificó.")
+        return False
+
+    # Las muestras ilegibles no quedan en el manifiesto para reintentarlas en el próximo entrenamiento
+    for image_path in report['omitidas']:
+        current_samples.pop(image_path, None)
 
     # Guardar el modelo entrenado
-    recognizer.write(trainer_path) # Guarda el modelo
+    _write_model(recognizer)
+    _save_manifest(current_samples)
+    # Las sesiones de reconocimiento de este proceso pasan al modelo nuevo sin detenerse
+    get_model_holder().refresh()
 
-    print(f"\n[INFO] {len(np.unique(all_ids))} rostros entrenados. Modelo guardado en {trainer_path}")
+    elapsed = time.perf_counter() - start
+    TRAINING_SECONDS.observe(elapsed, modo=mode)
+    TRAINING_IMAGES.inc(report['cargadas'], modo=mode)
+    TRAINING_THROUGHPUT.set(report['cargadas'] / elapsed if elapsed > 0 else 0.0, modo=mode)
+    labels = {info['label'] for info in current_samples.values()}
+    print(f"\n[INFO] {len(labels)} rostros entrenados ({report['cargadas']} imágenes, "
+          f"{report['cargadas'] / elapsed if elapsed > 0 else 0:.0f} imágenes/s). Modelo guardado en {trainer_path}")
     return True
 
+# Emisor de asistencias compartido por todas las sesiones de reconocimiento del proceso
+_attendance_sender = None
+_attendance_sender_lock = threading.Lock()
+
+def get_attendance_sender():
+    global _attendance_sender
+    with _attendance_sender_lock:
+        if _attendance_sender is None:
+            _attendance_sender = AttendanceSender(FLASK_API_BASE_URL, token=REGISTRO_TOKEN)
+        return _attendance_sender
+
+def _reset_attendance_sender():
+    # Un proceso hijo creado con fork no hereda el hilo del emisor: debe crear el suyo
+    global _attendance_sender, _attendance_sender_lock
+    _attendance_sender = None
+    _attendance_sender_lock = threading.Lock()
+
+# Modelo compartido por todas las sesiones de reconocimiento del proceso; se recarga solo al reentrenar
+_model_holder = ModelHolder(trainer_path)
+
+def get_model_holder():
+    return _model_holder
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_attendance_sender)
+    os.register_at_fork(after_in_child=lambda: _model_holder._after_fork())
+
 def register_attendance(alumno_id, estado="Presente"):
     """
     Envía una solicitud POST a la API de Flask para registrar la asistencia.
+    Es bloqueante; el bucle de reconocimiento usa get_attendance_sender().submit() en su lugar.
     """
     url = f"{FLASK_API_BASE_URL}/asistencias/registrar"
     data = {'alumno_id': alumno_id, 'estado': estado}
@@ -77,71 +251,174 @@ def register_attendance(alumno_id, estado="Presente"):
     except requests.exceptions.RequestException as e:
         print(f"Error al registrar asistencia para el alumno ID {alumno_id}: {e}")
 
-def recognize_face(alumno_id_map, threshold=60):
-    # Cargar el clasificador de rostros pre-entrenado de OpenCV
-    face_detector = cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_frontalface_default.xml')
-
-    # Cargar el reconocedor entrenado
+def load_recognizer():
+    """
+    Lee trainer.yml y devuelve un reconocedor LBPH propio, o None si todavía no se entrenó.
+    Para reconocer en vivo conviene get_model_holder().get(), que comparte el modelo ya cargado.
+    """
     recognizer = cv2.face.LBPHFaceRecognizer_create()
     try:
         recognizer.read(trainer_path)
     except cv2.error:
         print("Error: No se pudo cargar el modelo de entrenamiento. Asegúrate de que ha sido entrenado.")
-        return
+        return None
+    return recognizer
 
-    # Inicializar la cámara
-    cap = cv2.VideoCapture(0)
-    if not cap.isOpened():
-        print("Error: No se pudo abrir la cámara.")
-        return
+def _detect_and_predict(tracker, identities, recognizer, frame, stats=None):
+    """
+    Detecta (o sigue) los rostros del frame y obtiene la identidad de cada seguimiento.
+    Devuelve una lista de ((x, y, w, h), id_predicted, confidence, track_id, confirmed).
+    Con stats (StageStats) registra la duración de las etapas 'deteccion' y 'prediccion'.
+    """
+    start = time.perf_counter()
+    gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+    tracks = tracker.update(gray)
+    detected = time.perf_counter()
+    identities.prune({track.id for track in tracks})
+    boxes = [tracker.box_of(track) for track in tracks]
+    # Todas las predicciones del frame en un solo lote, con los rostros en el mismo tamaño que el dataset
+    faces = [(track.id, normalize_face(gray[y:y+h, x:x+w])) for track, (x, y, w, h) in zip(tracks, boxes)]
+    identified = identities.identify_many(faces, recognizer)
+    if stats is not None:
+        stats.record('deteccion', detected - start)
+        stats.record('prediccion', time.perf_counter() - detected)
+    return [(box, id_predicted, confidence, track.id, confirmed)
+            for track, box, (id_predicted, confidence, confirmed) in zip(tracks, boxes, identified)]
 
-    print("\n[INFO] Iniciando reconocimiento facial. Presiona 'q' para salir.")
-    # Usaremos una variable para controlar si ya registramos la asistencia para un alumno en el ciclo actual
-    last_recognized_id = None
-    
-    while True:
+def _handle_predictions(frame, predictions, alumno_id_map, registered, reconocidos, draw=True):
+    """
+    Registra la asistencia de los alumnos reconocidos y, con draw=True, dibuja los resultados sobre el frame.
+    La asistencia se envía una sola vez por seguimiento y alumno (pares guardados en registered).
+    """
+    for (x, y, w, h), id_predicted, confidence, track_id, confirmed in predictions:
+        if not confirmed:
+            name = "Verificando..."
+        elif id_predicted != UNKNOWN:
+            name = alumno_id_map.get(str(id_predicted), "Desconocido")
+            # Si reconocemos a un alumno que este seguimiento todavía no registró
+            if name != "Desconocido" and (track_id, id_predicted) not in registered:
+                get_attendance_sender().submit(id_predicted) # Registrar asistencia sin bloquear el video
+                reconocidos.add(id_predicted)
+                registered.add((track_id, id_predicted))
+        else:
+            name = "Desconocido"
+        if not draw:
+            continue
+        confidence_text = f"  {round(100 - confidence)}%"
+
+        cv2.rectangle(frame, (x, y), (x + w, y + h), (255, 0, 0), 2)
+        cv2.putText(frame, str(name), (x + 5, y - 5), cv2.FONT_HERSHEY_SIMPLEX, 1, (255, 255, 255), 2)
+        cv2.putText(frame, str(confidence_text), (x + 5, y + h + 25), cv2.FONT_HERSHEY_SIMPLEX, 1, (255, 255, 0), 1)
+
+def _sequential_frames(cap, process_fn, stats, cancel_event):
+    # Captura, detección y reconocimiento uno detrás del otro en el mismo hilo
+    while cancel_event is None or not cancel_event.is_set():
+        start = time.perf_counter()
         ret, frame = cap.read()
         if not ret:
             print("Error al leer el frame de la cámara.")
             break
+        grabbed = time.perf_counter()
+        stats.record('captura', grabbed - start)
+        predictions = process_fn(frame)
+        stats.record('procesamiento', time.perf_counter() - grabbed)
+        stats.record('total', time.perf_counter() - start)
+        stats.tick()
+        yield frame, predictions
+
+def recognize_face(alumno_id_map, threshold=60, progress=None, cancel_event=None, pipelined=False, workers=2,
+                   detection_options=None, source=0, recognizer=None, display=True, preview=None):
+    """
+    Reconoce rostros en tiempo real y registra la asistencia de los alumnos reconocidos.
+    progress(frames=..., reconocidos=..., stats=...) recibe el avance y cancel_event (threading.Event) detiene el bucle.
+
+    source es cualquier fuente aceptada por open_source (índice de cámara, archivo de video o
+    directorio de imágenes). Sin recognizer se usa el modelo compartido del proceso
+    (get_model_holder()), que se recarga solo cuando se reentrena; con un recognizer propio se usa
+    ese modelo fijo. display=False evita abrir la ventana de OpenCV. Sin ventana ni preview (PreviewStream) el
+    reconocimiento corre sin dibujar nada; con preview los frames se anotan y codifican solo
+    mientras haya algún cliente mirando, hasta preview.max_fps por segundo.
+
+    Con pipelined=True la cámara se lee en un hilo propio y la detección/reconocimiento corre en
+    `workers` hilos en paralelo; en cámaras y streams los frames que no se alcanzan a procesar se
+    descartan, en archivos y directorios se procesan todos.
+    detection_options se pasa a FaceTracker (scale, detection_interval, min_face_size, ...).
+    Cada rostro seguido fija su identidad por votación (IdentityCache) y solo se vuelve a
+    predecir periódicamente. Devuelve las estadísticas de FPS y latencia por etapa.
+    """
+    detection_options = detection_options or {}
+
+    # Obtener el reconocedor entrenado
+    if recognizer is None:
+        model = get_model_holder()
+        if model.get() is None:
+            print("Error: No se pudo cargar el modelo de entrenamiento. Asegúrate de que ha sido entrenado.")
+            return
+        get_recognizer = model.get
+    else:
+        get_recognizer = lambda: recognizer
+
+    # Inicializar la cámara
+    cap = open_source(source)
+    if not cap.isOpened():
+        print(f"Error: No se pudo abrir la fuente de video {source}.")
+        return
+    window_name = 'Reconocimiento Facial' if source == 0 else f'Reconocimiento Facial - {source_name(source)}'
+
+    print(f"\n[INFO] Iniciando reconocimiento facial en {source_name(source)}. Presiona 'q' para salir.")
+    # Pares (seguimiento, alumno) cuya asistencia ya se envió en esta sesión
+    registered = set()
+    reconocidos = set()
+    stats = StageStats(source=source_name(source))
+    identity_caches = []
+
+    def process_factory():
+        tracker = FaceTracker(**detection_options)
+        identities = IdentityCache(threshold)
+        identity_caches.append(identities)
+        return lambda frame: _detect_and_predict(tracker, identities, get_recognizer(), frame, stats)
+
+    pipeline = None
+    if pipelined:
+        if workers > 1 and detection_options.get('detection_interval', DETECTION_INTERVAL) > 1:
+            # El seguimiento necesita ver los frames en orden: un solo worker, que igual
+            # se superpone con la lectura de la cámara
+            workers = 1
+        pipeline = FramePipeline(cap, process_factory, workers=workers, stats=stats,
+                                 live=is_live_source(source)).start()
+        frames = pipeline.results(cancel_event)
+    else:
+        frames = _sequential_frames(cap, process_factory(), stats, cancel_event)
+
+    for frame, predictions in frames:
+        send_preview = preview is not None and preview.wants_frame()
+        start = time.perf_counter()
+        _handle_predictions(frame, predictions, alumno_id_map, registered, reconocidos, draw=display or send_preview)
+        if send_preview:
+            preview.publish(frame)
+        if display or send_preview:
+            stats.record('dibujo', time.perf_counter() - start)
+
+        if progress:
+            progress(frames=stats.frames, reconocidos=len(reconocidos), stats=stats.snapshot())
 
-        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-        faces = face_detector.detectMultiScale(gray, 1.3, 5)
-
-        current_recognized_id = None # Reiniciar por cada frame
-        
-        for (x, y, w, h) in faces:
-            cv2.rectangle(frame, (x, y), (x + w, y + h), (255, 0, 0), 2)
-            id_predicted, confidence = recognizer.predict(gray[y:y+h, x:x+w])
-
-            if confidence < threshold:
-                name = alumno_id_map.get(str(id_predicted), "Desconocido")
-                confidence_text = f"  {round(100 - confidence)}%"
-                
-                # Si reconocemos a un alumno y no es el mismo que el último reconocido
-                if name != "Desconocido" and id_predicted != last_recognized_id:
-                    register_attendance(id_predicted) # Registrar asistencia
-                    current_recognized_id = id_predicted # Marcar como reconocido en este frame
-                    last_recognized_id = id_predicted # Actualizar el último ID reconocido
-                elif name != "Desconocido" and id_predicted == last_recognized_id:
-                    current_recognized_id = id_predicted # Sigue siendo el mismo alumno
-            else:
-                name = "Desconocido"
-                confidence_text = f"  {round(100 - confidence)}%"
-
-            cv2.putText(frame, str(name), (x + 5, y - 5), cv2.FONT_HERSHEY_SIMPLEX, 1, (255, 255, 255), 2)
-            cv2.putText(frame, str(confidence_text), (x + 5, y + h + 25), cv2.FONT_HERSHEY_SIMPLEX, 1, (255, 255, 0), 1)
-
-        # Si no se reconoce a nadie en el frame actual, resetear last_recognized_id
-        if current_recognized_id is None:
-            last_recognized_id = None
-
-        cv2.imshow('Reconocimiento Facial', frame)
-
-        k = cv2.waitKey(1) & 0xff # Espera 1ms
-        if k == ord('q'):
+        if display:
+            cv2.imshow(window_name, frame)
+            k = cv2.waitKey(1) & 0xff # Espera 1ms
+            if k == ord('q'):
+                break
+        if cancel_event is not None and cancel_event.is_set():
             break
 
+    if pipeline:
+        pipeline.stop()
     cap.release()
-    cv2.destroyAllWindows()
-    print("\n[INFO] Reconocimiento facial finalizado.")
\ No newline at end of file
+    if display:
+        cv2.destroyWindow(window_name)
+    summary = stats.snapshot()
+    summary['predicciones'] = sum(c.predictions for c in identity_caches)
+    summary['identidades_reutilizadas'] = sum(c.hits for c in identity_caches)
+    if recognizer is None:
+        summary['version_modelo'] = model.version
+    print(f"\n[INFO] Reconocimiento facial finalizado. {summary['fps']} FPS sostenidos, latencias: {summary['latencias']}")
+    return summary
\ No newline at end of file
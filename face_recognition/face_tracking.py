@@ -0,0 +1,143 @@
+import itertools
+
+import cv2
+
+# Valores por defecto del modo de detección con seguimiento
+DETECTION_SCALE = 0.5 # El detector Haar corre sobre el frame reducido a esta escala
+DETECTION_INTERVAL = 5 # Cada cuántos frames se vuelve a correr el detector
+MIN_FACE_SIZE = 60 # Lado mínimo del rostro, en píxeles del frame original
+MATCH_THRESHOLD = 0.5 # Similitud mínima del template matching para seguir un rostro
+MAX_MISSES = 2 # Detecciones seguidas sin encontrar un rostro antes de descartar su seguimiento
+
+def _iou(a, b):
+    ax, ay, aw, ah = a
+    bx, by, bw, bh = b
+    ix = max(0, min(ax + aw, bx + bw) - max(ax, bx))
+    iy = max(0, min(ay + ah, by + bh) - max(ay, by))
+    inter = ix * iy
+    union = aw * ah + bw * bh - inter
+    return inter / union if union else 0.0
+
+class Track:
+    """Un rostro seguido entre frames. box está en coordenadas del frame reducido."""
+
+    def __init__(self, track_id, box, template):
+        self.id = track_id
+        self.box = box
+        self.template = template
+        self.misses = 0
+        self.detected = True # True si el rostro salió del detector en este frame
+
+class FaceTracker:
+    """
+    Detección de rostros reducida y espaciada con seguimiento entre detecciones.
+
+    El detector Haar corre sobre el frame reducido cada detection_interval frames (o antes si se
+    pierde algún rostro); en los frames intermedios cada rostro se sigue con template matching en
+    una ventana alrededor de su última posición. Con scale=1 y detection_interval=1 se comporta
+    igual que correr detectMultiScale sobre cada frame completo.
+    """
+
+    def __init__(self, scale=DETECTION_SCALE, detection_interval=DETECTION_INTERVAL,
+                 min_face_size=MIN_FACE_SIZE, match_threshold=MATCH_THRESHOLD, max_misses=MAX_MISSES):
+        # Cargar el clasificador de rostros pre-entrenado de OpenCV
+        self.detector = cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_frontalface_default.xml')
+        self.scale = scale
+        self.detection_interval = max(1, detection_interval)
+        self.min_face_size = min_face_size
+        self.match_threshold = match_threshold
+        self.max_misses = max_misses
+        self.tracks = []
+        self._ids = itertools.count(1)
+        self._frames_since_detection = 0
+        self._lost = True
+        self.detections = 0
+
+    def update(self, gray):
+        """
+        Procesa un frame en escala de grises y devuelve los seguimientos activos.
+        Usar box_of(track) para obtener la caja en coordenadas del frame original.
+        """
+        small = gray if self.scale == 1 else cv2.resize(gray, None, fx=self.scale, fy=self.scale,
+                                                         interpolation=cv2.INTER_AREA)
+        if self._lost or self._frames_since_detection + 1 >= self.detection_interval:
+            self._detect(small)
+        else:
+            self._follow(small)
+        return self.tracks
+
+    def box_of(self, track):
+        x, y, w, h = track.box
+        if self.scale == 1:
+            return int(x), int(y), int(w), int(h)
+        s = 1 / self.scale
+        return int(x * s), int(y * s), int(w * s), int(h * s)
+
+    def _detect(self, small):
+        self.detections += 1
+        self._frames_since_detection = 0
+        self._lost = False
+        min_side = max(1, int(self.min_face_size * self.scale))
+        boxes = [tuple(int(v) for v in b) for b in
+                 self.detector.detectMultiScale(small, 1.3, 5, minSize=(min_side, min_side))]
+
+        # Emparejar detecciones con seguimientos existentes por IoU, de mayor a menor
+        pairs = sorted(((_iou(t.box, b), ti, bi) for ti, t in enumerate(self.tracks) for bi, b in enumerate(boxes)),
+                       reverse=True)
+        matched_tracks = set()
+        matched_boxes = set()
+        for iou, ti, bi in pairs:
+            if iou < 0.3:
+                break
+            if ti in matched_tracks or bi in matched_boxes:
+                continue
+            matched_tracks.add(ti)
+            matched_boxes.add(bi)
+            self._refresh(self.tracks[ti], boxes[bi], small)
+
+        tracks = []
+        for ti, track in enumerate(self.tracks):
+            if ti in matched_tracks:
+                tracks.append(track)
+                continue
+            track.misses += 1
+            track.detected = False
+            if track.misses <= self.max_misses:
+                tracks.append(track)
+        for bi, box in enumerate(boxes):
+            if bi not in matched_boxes:
+                x, y, w, h = box
+                tracks.append(Track(next(self._ids), box, small[y:y+h, x:x+w].copy()))
+        self.tracks = tracks
+
+    def _refresh(self, track, box, small):
+        x, y, w, h = box
+        track.box = box
+        track.template = small[y:y+h, x:x+w].copy()
+        track.misses = 0
+        track.detected = True
+
+    def _follow(self, small):
+        self._frames_since_detection += 1
+        height, width = small.shape[:2]
+        tracks = []
+        for track in self.tracks:
+            track.detected = False
+            x, y, w, h = track.box
+            # Buscar el template en una ventana de medio rostro alrededor de la última posición
+            mx, my = w // 2, h // 2
+            x0, y0 = max(0, x - mx), max(0, y - my)
+            x1, y1 = min(width, x + w + mx), min(height, y + h + my)
+            window = small[y0:y1, x0:x1]
+            if window.shape[0] < h or window.shape[1] < w:
+                self._lost = True
+                continue
+            result = cv2.matchTemplate(window, track.template, cv2.TM_CCOEFF_NORMED)
+            _, score, _, (bx, by) = cv2.minMaxLoc(result)
+            if score < self.match_threshold:
+                # Se perdió el rostro: forzar una detección en el próximo frame
+                self._lost = True
+                continue
+            track.box = (x0 + bx, y0 + by, w, h)
+            tracks.append(track)
+        self.tracks = tracks
@@ -0,0 +1,109 @@
+import cv2
+
+UNKNOWN = -1 # Identidad confirmada de un rostro que no corresponde a ningún alumno
+
+VOTES_NEEDED = 3 # Predicciones que se votan antes de fijar la identidad de un seguimiento
+REVERIFY_INTERVAL = 30 # Cada cuántos frames se vuelve a predecir una identidad ya fijada
+APPEARANCE_THRESHOLD = 0.6 # Similitud mínima con la miniatura de referencia; por debajo se vuelve a predecir
+THUMBNAIL_SIZE = (24, 24)
+
+class _TrackState:
+    def __init__(self):
+        self.votes = {}
+        self.predictions = 0
+        self.identity = None # (id, confidence) una vez fijada
+        self.since_verify = 0
+        self.thumbnail = None
+
+class IdentityCache:
+    """
+    Identidad por seguimiento: en lugar de correr recognizer.predict en cada frame, cada rostro
+    seguido acumula votos (pesados por la confianza) durante sus primeros frames y después
+    reutiliza la identidad ganadora. Se vuelve a predecir cada reverify_interval frames o cuando
+    el rostro cambia de aspecto (p. ej. el seguimiento saltó a otra persona).
+    """
+
+    def __init__(self, threshold, votes_needed=VOTES_NEEDED, reverify_interval=REVERIFY_INTERVAL,
+                 appearance_threshold=APPEARANCE_THRESHOLD):
+        self.threshold = threshold
+        self.votes_needed = votes_needed
+        self.reverify_interval = reverify_interval
+        self.appearance_threshold = appearance_threshold
+        self._tracks = {}
+        self.predictions = 0
+        self.hits = 0
+
+    def identify(self, track_id, face_gray, recognizer):
+        """
+        Devuelve (id, confidence, confirmed). Mientras se vota confirmed es False; una vez fijada la
+        identidad id es el alumno ganador o UNKNOWN.
+        """
+        return self.identify_many([(track_id, face_gray)], recognizer)[0]
+
+    def identify_many(self, faces, recognizer):
+        """
+        Como identify() para todos los rostros [(track_id, face_gray), ...] de un frame. Los que
+        necesitan predicción se le pasan juntos a recognizer.predict_batch si el reconocedor lo tiene.
+        """
+        results = [None] * len(faces)
+        pending = []
+        for i, (track_id, face_gray) in enumerate(faces):
+            state = self._tracks.setdefault(track_id, _TrackState())
+            thumbnail = cv2.resize(face_gray, THUMBNAIL_SIZE, interpolation=cv2.INTER_AREA)
+            if state.identity is not None:
+                state.since_verify += 1
+                if state.since_verify < self.reverify_interval and self._same_appearance(state, thumbnail):
+                    self.hits += 1
+                    results[i] = state.identity + (True,)
+                    continue
+            state.thumbnail = thumbnail
+            pending.append(i)
+
+        if not pending:
+            return results
+        self.predictions += len(pending)
+        pending_faces = [faces[i][1] for i in pending]
+        if hasattr(recognizer, 'predict_batch'):
+            predicted = recognizer.predict_batch(pending_faces)
+        else:
+            predicted = [recognizer.predict(face) for face in pending_faces]
+        for i, (id_predicted, confidence) in zip(pending, predicted):
+            results[i] = self._vote(self._tracks[faces[i][0]], id_predicted, confidence)
+        return results
+
+    def _vote(self, state, id_predicted, confidence):
+        if state.identity is not None:
+            state.since_verify = 0
+            if (id_predicted if confidence < self.threshold else UNKNOWN) == state.identity[0]:
+                return state.identity + (True,)
+            # La verificación no coincide: volver a votar desde cero
+            state.votes = {}
+            state.predictions = 0
+            state.identity = None
+
+        state.predictions += 1
+        if confidence < self.threshold:
+            # Cuanto menor la distancia LBPH, más pesa el voto
+            state.votes[id_predicted] = state.votes.get(id_predicted, 0) + (self.threshold - confidence)
+        if state.predictions < self.votes_needed:
+            return id_predicted, confidence, False
+
+        if state.votes:
+            winner = max(state.votes, key=state.votes.get)
+            # Confianza equivalente al promedio de los votos del ganador
+            state.identity = (winner, self.threshold - state.votes[winner] / state.predictions)
+        else:
+            state.identity = (UNKNOWN, confidence)
+        state.since_verify = 0
+        return state.identity + (True,)
+
+    def prune(self, active_track_ids):
+        """Olvida los seguimientos que ya no están activos."""
+        for track_id in [t for t in self._tracks if t not in active_track_ids]:
+            del self._tracks[track_id]
+
+    def _same_appearance(self, state, thumbnail):
+        if state.thumbnail is None:
+            return False
+        score = cv2.matchTemplate(thumbnail, state.thumbnail, cv2.TM_CCOEFF_NORMED)[0][0]
+        return score >= self.appearance_threshold
@@ -0,0 +1,149 @@
+import math
+
+import numpy as np
+
+SHORTLIST = 20 # Alumnos candidatos (por cercanía al centroide) que pasan a la comparación exacta
+CHUNK_ELEMENTS = 1 << 18 # Tope de elementos (1 MB en float32, entra en caché) del bloque temporal al medir distancias
+
+
+def _lbp(gray, radius, neighbors):
+    """LBP extendido (circular, con interpolación bilineal) igual al de OpenCV."""
+    src = gray.astype(np.float32)
+    rows, cols = src.shape
+    center = src[radius:rows - radius, radius:cols - radius]
+    codes = np.zeros(center.shape, dtype=np.int64)
+    for n in range(neighbors):
+        x = np.float32(radius * math.cos(2.0 * math.pi * n / neighbors))
+        y = np.float32(-radius * math.sin(2.0 * math.pi * n / neighbors))
+        fx, fy = int(math.floor(x)), int(math.floor(y))
+        cx, cy = int(math.ceil(x)), int(math.ceil(y))
+        tx, ty = np.float32(x - fx), np.float32(y - fy)
+        w1, w2 = (1 - tx) * (1 - ty), tx * (1 - ty)
+        w3, w4 = (1 - tx) * ty, tx * ty
+
+        def shifted(dy, dx):
+            return src[radius + dy:rows - radius + dy, radius + dx:cols - radius + dx]
+
+        t = w1 * shifted(fy, fx) + w2 * shifted(fy, cx) + w3 * shifted(cy, fx) + w4 * shifted(cy, cx)
+        codes += ((t > center) | (np.abs(t - center) < np.finfo(np.float32).eps)).astype(np.int64) << n
+    return codes
+
+def spatial_histogram(gray, radius=1, neighbors=8, grid_x=8, grid_y=8):
+    """Histograma LBP por celdas de la grilla, normalizado por celda, como un vector float32."""
+    codes = _lbp(gray, radius, neighbors)
+    bins = 1 << neighbors
+    height, width = codes.shape[0] // grid_y, codes.shape[1] // grid_x
+    if height == 0 or width == 0:
+        return np.zeros(grid_x * grid_y * bins, dtype=np.float32)
+    # Recortar a la grilla y agrupar los códigos de cada celda
+    cells = codes[:grid_y * height, :grid_x * width].reshape(grid_y, height, grid_x, width)
+    cell_index = np.arange(grid_y * grid_x).reshape(grid_y, 1, grid_x, 1)
+    hist = np.bincount((cell_index * bins + cells).ravel(), minlength=grid_x * grid_y * bins)
+    return (hist / (height * width)).astype(np.float32)
+
+def _chi_square_matrix(queries, hists_t, hist_sums, cols=None):
+    """
+    Distancia chi-cuadrado alternativa de OpenCV (HISTCMP_CHISQR_ALT) entre cada consulta (filas de
+    queries) y las columnas de hists_t: histogramas como columnas, bins como filas. cols es None
+    (todas las columnas, resultado (consultas, columnas)) o una matriz de índices con las columnas
+    de cada consulta (resultado de la misma forma).
+
+    Usa que 2(a-b)^2/(a+b) = 2(a+b) - 8ab/(a+b): las sumas de cada histograma se precalculan y el
+    término cruzado solo es distinto de cero en los bins no nulos de la consulta, que en LBP son
+    apenas un 10-30 % de los 16384. Cada consulta recorre sus propios bins no nulos, completados con
+    bins nulos suyos (que suman 0) hasta la consulta con más bins, en bloques de CHUNK_ELEMENTS.
+    """
+    nonzero = queries > 0
+    bins = np.argsort(~nonzero, axis=1, kind='stable')[:, :nonzero.sum(axis=1).max()]
+    q = np.take_along_axis(queries, bins, axis=1)[:, :, None]
+    width = hists_t.shape[1] if cols is None else cols.shape[1]
+    cross = np.zeros((len(queries), width), dtype=np.float64)
+    step = max(1, CHUNK_ELEMENTS // max(1, len(queries) * width))
+    for start in range(0, bins.shape[1], step):
+        chunk = bins[:, start:start + step]
+        # Filas enteras si no hay columnas que elegir: mucho más rápido que el índice en dos ejes
+        block = hists_t[chunk] if cols is None else hists_t[chunk[:, :, None], cols[:, None, :]]
+        qc = q[:, start:start + step]
+        den = block + qc
+        # En un bin de relleno con el histograma también en 0 el término es 0/0; con den > 0 queda en 0
+        np.maximum(den, np.finfo(np.float32).tiny, out=den)
+        block *= qc
+        block /= den
+        cross += block.sum(axis=1, dtype=np.float64)
+    sums = hist_sums if cols is None else hist_sums[cols]
+    return 2 * (queries.sum(axis=1, dtype=np.float64)[:, None] + sums) - 8 * cross
+
+class LBPHMatcher:
+    """
+    Reemplazo de LBPHFaceRecognizer.predict para muchos alumnos.
+
+    Guarda los histogramas de entrenamiento en una matriz NumPy contigua (un histograma por
+    columna, agrupados por alumno) y el centroide de cada alumno. predict_batch() calcula los
+    histogramas de todos los rostros del frame, se queda con los `shortlist` alumnos de centroide
+    más cercano a cada uno y hace la comparación exacta solo contra sus muestras. Devuelve el mismo
+    (id, confidence) que predict de OpenCV; con shortlist >= cantidad de alumnos el resultado es
+    exactamente el de la búsqueda lineal.
+    """
+
+    def __init__(self, histograms, labels, radius=1, neighbors=8, grid_x=8, grid_y=8, shortlist=SHORTLIST):
+        """histograms es una secuencia de histogramas (como la lista de getHistograms), uno por etiqueta."""
+        labels = np.asarray(labels, dtype=np.int64).ravel()
+        self.radius, self.neighbors = radius, neighbors
+        self.grid_x, self.grid_y = grid_x, grid_y
+        self.shortlist = shortlist
+
+        # Columnas ordenadas por alumno: las muestras de cada uno quedan en un rango contiguo
+        order = np.argsort(labels, kind='stable')
+        self.labels = labels[order]
+        self.students, starts, counts = np.unique(self.labels, return_index=True, return_counts=True)
+        self._ranges = [np.arange(a, a + n) for a, n in zip(starts, counts)]
+        # Una sola copia: cada histograma se escribe directo en su columna, sin apilar ni transponer
+        dims = np.size(histograms[0]) if len(order) else 0
+        self.histograms_t = np.empty((dims, len(order)), dtype=np.float32)
+        for col, i in enumerate(order):
+            self.histograms_t[:, col] = np.ravel(histograms[i])
+        self._sums = self.histograms_t.sum(axis=0, dtype=np.float64)
+        self.centroids_t = np.stack([self.histograms_t[:, r].mean(axis=1) for r in self._ranges], axis=1) \
+            if self._ranges else np.zeros((0, 0), dtype=np.float32)
+        self._centroid_sums = self.centroids_t.sum(axis=0, dtype=np.float64)
+
+    @classmethod
+    def from_recognizer(cls, recognizer, shortlist=SHORTLIST):
+        return cls(recognizer.getHistograms(), recognizer.getLabels(), recognizer.getRadius(),
+                   recognizer.getNeighbors(), recognizer.getGridX(), recognizer.getGridY(), shortlist)
+
+    def histogram(self, gray):
+        return spatial_histogram(gray, self.radius, self.neighbors, self.grid_x, self.grid_y)
+
+    def predict(self, gray):
+        return self.predict_batch([gray])[0]
+
+    def predict_batch(self, faces):
+        """
+        Devuelve [(id, confidence), ...] para una lista de rostros en escala de grises. Los histogramas
+        de todos los rostros se apilan en una matriz y cada etapa mide todas las distancias de una vez.
+        """
+        if not len(self.students):
+            return [(-1, float('inf'))] * len(faces)
+        if not len(faces):
+            return []
+        queries = np.empty((len(faces), self.histograms_t.shape[0]), dtype=np.float32)
+        for i, face in enumerate(faces):
+            queries[i] = self.histogram(face)
+        if len(self.students) <= self.shortlist:
+            distances = _chi_square_matrix(queries, self.histograms_t, self._sums)
+            best = distances.argmin(axis=1)
+            return [(int(self.labels[b]), float(distances[i, b])) for i, b in enumerate(best)]
+        # Primera etapa: alumnos cuyo centroide está más cerca de cada rostro
+        to_centroids = _chi_square_matrix(queries, self.centroids_t, self._centroid_sums)
+        candidates = np.sort(np.argpartition(to_centroids, self.shortlist - 1, axis=1)[:, :self.shortlist], axis=1)
+        # Segunda etapa: comparación exacta contra las muestras de los candidatos de cada rostro, en una
+        # matriz de índices completada con -1 hasta el rostro con más muestras candidatas
+        per_face = [np.concatenate([self._ranges[s] for s in row]) for row in candidates]
+        cols = np.full((len(faces), max(len(c) for c in per_face)), -1, dtype=np.int64)
+        for i, c in enumerate(per_face):
+            cols[i, :len(c)] = c
+        distances = _chi_square_matrix(queries, self.histograms_t, self._sums, cols)
+        distances[cols < 0] = np.inf
+        best = distances.argmin(axis=1)
+        return [(int(self.labels[cols[i, b]]), float(distances[i, b])) for i, b in enumerate(best)]
@@ -0,0 +1,212 @@
+import bisect
+import math
+import os
+import threading
+
+# Límites (en segundos) de los histogramas de latencia
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# Límites de los histogramas de cantidad de consultas SQL por request
+COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200)
+
+def _format_value(value):
+    if value == math.inf:
+        return '+Inf'
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+def _format_labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ''
+    escaped = (str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, v in pairs)
+    return '{' + ','.join(f'{n}="{v}"' for (n, _), v in zip(pairs, escaped)) + '}'
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, help, labels=()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self._lock = threading.Lock()
+        self._values = {}
+
+    def _key(self, labels):
+        return tuple(str(labels.get(name, '')) for name in self.labels)
+
+    def dump(self):
+        with self._lock:
+            return {key: self._copy(value) for key, value in self._values.items()}
+
+    def merge(self, values):
+        """Suma a esta métrica los valores de un dump() (por ejemplo, de un proceso hijo)."""
+        with self._lock:
+            self._merge_values(self._values, values)
+
+    def _copy(self, value):
+        return value
+
+class Counter(_Metric):
+    kind = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def _merge_values(self, target, values):
+        for key, value in values.items():
+            target[key] = target.get(key, 0) + value
+
+    def lines(self, values):
+        return [f'{self.name}{_format_labels(self.labels, key)} {_format_value(v)}' for key, v in sorted(values.items())]
+
+class Gauge(Counter):
+    kind = 'gauge'
+
+    def set(self, value, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def _merge_values(self, target, values):
+        # Un gauge es un valor actual: el último informado reemplaza al anterior
+        target.update(values)
+
+class Histogram(_Metric):
+    kind = 'histogram'
+
+    def __init__(self, name, help, labels=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            counts = self._values.get(key)
+            if counts is None:
+                # Cantidad por intervalo (el último es +Inf) y suma de los valores
+                counts = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            counts[0][index] += 1
+            counts[1] += value
+
+    def _copy(self, value):
+        return [list(value[0]), value[1]]
+
+    def _merge_values(self, target, values):
+        for key, (counts, total) in values.items():
+            mine = target.get(key)
+            target[key] = [list(counts), total] if mine is None else \
+                [[a + b for a, b in zip(mine[0], counts)], mine[1] + total]
+
+    def lines(self, values):
+        lines = []
+        for key, (counts, total) in sorted(values.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (math.inf,), counts):
+                cumulative += count
+                le = (('le', _format_value(bound)),)
+                lines.append(f'{self.name}_bucket{_format_labels(self.labels, key, le)} {cumulative}')
+            lines.append(f'{self.name}_sum{_format_labels(self.labels, key)} {_format_value(total)}')
+            lines.append(f'{self.name}_count{_format_labels(self.labels, key)} {cumulative}')
+        return lines
+
+class Registry:
+    """
+    Métricas del proceso, exportadas en el formato de texto de Prometheus por render().
+
+    Los procesos hijos (una fuente del servicio de reconocimiento) parten de un registro vacío y
+    mandan su dump() al proceso principal, que lo guarda con set_remote() y lo suma al exportar;
+    absorb() incorpora definitivamente las métricas de un hijo que terminó.
+    """
+
+    def __init__(self):
+        self._metrics = {}
+        self._remote = {}
+        self._lock = threading.Lock()
+
+    def _get_or_create(self, cls, name, help, labels, **kwargs):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, help, labels, **kwargs)
+            return metric
+
+    def counter(self, name, help, labels=()):
+        return self._get_or_create(Counter, name, help, labels)
+
+    def gauge(self, name, help, labels=()):
+        return self._get_or_create(Gauge, name, help, labels)
+
+    def histogram(self, name, help, labels=(), buckets=LATENCY_BUCKETS):
+        return self._get_or_create(Histogram, name, help, labels, buckets=buckets)
+
+    def dump(self):
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return {metric.name: metric.dump() for metric in metrics}
+
+    def _after_fork(self):
+        # El hijo parte de cero y con locks nuevos: otro hilo del padre podía tener alguno tomado
+        self._lock = threading.Lock()
+        self._remote = {}
+        for metric in self._metrics.values():
+            metric._lock = threading.Lock()
+            metric._values = {}
+
+    def set_remote(self, key, dump):
+        with self._lock:
+            self._remote[key] = dump
+
+    def absorb(self, key):
+        with self._lock:
+            dump = self._remote.pop(key, None)
+        for name, values in (dump or {}).items():
+            if name in self._metrics:
+                self._metrics[name].merge(values)
+
+    def render(self):
+        with self._lock:
+            metrics = sorted(self._metrics.values(), key=lambda m: m.name)
+            remotes = list(self._remote.values())
+        lines = []
+        for metric in metrics:
+            values = metric.dump()
+            # Sumar lo informado por los procesos hijos sin modificar las métricas locales
+            for dump in remotes:
+                if metric.name in dump:
+                    metric._merge_values(values, dump[metric.name])
+            lines.append(f'# HELP {metric.name} {metric.help}')
+            lines.append(f'# TYPE {metric.name} {metric.kind}')
+            lines.extend(metric.lines(values))
+        return '\n'.join(lines) + '\n'
+
+REGISTRY = Registry()
+
+if hasattr(os, 'register_at_fork'):
+    # Un hijo creado con fork no debe volver a informar lo que ya contó el proceso principal
+    os.register_at_fork(after_in_child=REGISTRY._after_fork)
+
+# --- Métricas del reconocimiento facial ---
+
+VISION_STAGE_SECONDS = REGISTRY.histogram(
+    'vision_etapa_segundos', 'Duración de cada etapa del bucle de reconocimiento por frame.', ('fuente', 'etapa'))
+VISION_FRAMES = REGISTRY.counter(
+    'vision_frames_total', 'Frames procesados por el reconocimiento.', ('fuente',))
+ATTENDANCE_POST_SECONDS = REGISTRY.histogram(
+    'asistencia_envio_segundos', 'Duración del POST de un lote de asistencias al servidor.', ('resultado',))
+ATTENDANCE_SENT = REGISTRY.counter(
+    'asistencia_envios_total', 'Asistencias procesadas por el emisor, por resultado.', ('resultado',))
+TRAINING_SECONDS = REGISTRY.histogram(
+    'entrenamiento_segundos', 'Duración de cada entrenamiento del modelo.', ('modo',),
+    buckets=(1, 5, 10, 30, 60, 120, 300, 600, 1800))
+TRAINING_IMAGES = REGISTRY.counter(
+    'entrenamiento_imagenes_total', 'Muestras pasadas al reconocedor.', ('modo',))
+TRAINING_THROUGHPUT = REGISTRY.gauge(
+    'entrenamiento_imagenes_por_segundo', 'Muestras por segundo del último entrenamiento.', ('modo',))
+MODEL_BYTES = REGISTRY.gauge('modelo_bytes', 'Tamaño en disco de trainer.yml cargado.')
+MODEL_HISTOGRAMS = REGISTRY.gauge('modelo_histogramas', 'Histogramas (muestras) del modelo cargado.')
+MODEL_LOAD_SECONDS = REGISTRY.gauge('modelo_carga_segundos', 'Duración de la última carga del modelo.')
+CAPTURE_SAMPLES = REGISTRY.counter('captura_muestras_total', 'Rostros guardados por la captura.')
+CAPTURE_REJECTED = REGISTRY.counter('captura_rechazos_total', 'Frames descartados por la captura.', ('motivo',))
@@ -0,0 +1,111 @@
+import os
+import threading
+import time
+
+import cv2
+import numpy as np
+
+from face_recognition.lbph_matcher import LBPHMatcher
+from face_recognition.metrics import MODEL_BYTES, MODEL_HISTOGRAMS, MODEL_LOAD_SECONDS
+
+CHECK_INTERVAL = 2.0 # Cada cuántos segundos se revisa si trainer.yml cambió en disco
+# Con motor 'auto', a partir de cuántos alumnos se usa LBPHMatcher en lugar del predict de OpenCV
+MATCHER_MIN_STUDENTS = 50
+
+def wrap_recognizer(recognizer, engine='auto'):
+    """
+    Devuelve el objeto con el que se va a predecir: el LBPHFaceRecognizer tal cual ('opencv') o un
+    LBPHMatcher construido con sus histogramas ('numpy'). 'auto' elige según la cantidad de alumnos.
+    """
+    if engine == 'auto':
+        labels = recognizer.getLabels()
+        students = len(np.unique(labels)) if labels is not None else 0
+        engine = 'numpy' if students >= MATCHER_MIN_STUDENTS else 'opencv'
+    return LBPHMatcher.from_recognizer(recognizer) if engine == 'numpy' else recognizer
+
+def _stamp(path):
+    # El inodo cambia con cada os.replace, así que también detecta reemplazos con el mismo mtime
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return st.st_mtime_ns, st.st_size, st.st_ino
+
+class ModelHolder:
+    """
+    Modelo LBPH compartido por todo el proceso.
+
+    get() devuelve el reconocedor ya cargado sin tocar el disco. Como mucho cada check_interval
+    segundos compara la marca (mtime, tamaño, inodo) de trainer.yml; si cambió, el modelo nuevo se
+    lee en un hilo aparte y se reemplaza de una sola vez cuando está listo, así el bucle de video
+    sigue usando el anterior mientras tanto. version se incrementa con cada modelo cargado.
+    engine es el motor de comparación (ver wrap_recognizer).
+    """
+
+    def __init__(self, path, check_interval=CHECK_INTERVAL, engine='auto'):
+        self.path = path
+        self.check_interval = check_interval
+        self.engine = engine
+        self.version = 0
+        self._recognizer = None
+        self._stamp = None
+        self._last_check = 0.0
+        self._lock = threading.Lock()
+        self._reloading = False
+
+    def get(self):
+        """Devuelve el reconocedor actual, o None si todavía no hay un modelo entrenado."""
+        if self._recognizer is None:
+            with self._lock:
+                if self._recognizer is None:
+                    self._load()
+            return self._recognizer
+        now = time.monotonic()
+        if now - self._last_check >= self.check_interval:
+            self._last_check = now
+            self.refresh()
+        return self._recognizer
+
+    def refresh(self):
+        """Recarga el modelo en segundo plano si el archivo cambió desde la última carga."""
+        if self._recognizer is None or _stamp(self.path) in (None, self._stamp):
+            return
+        with self._lock:
+            if self._reloading:
+                return
+            self._reloading = True
+        threading.Thread(target=self._reload, name='recarga-modelo', daemon=True).start()
+
+    def _reload(self):
+        try:
+            self._load()
+        finally:
+            self._reloading = False
+
+    def _load(self):
+        stamp = _stamp(self.path)
+        if stamp is None:
+            return
+        recognizer = cv2.face.LBPHFaceRecognizer_create()
+        start = time.perf_counter()
+        try:
+            recognizer.read(self.path)
+        except cv2.error as e:
+            print(f"[WARN] No se pudo cargar el modelo {self.path}: {e}")
+            return
+        labels = recognizer.getLabels()
+        recognizer = wrap_recognizer(recognizer, self.engine)
+        # Reemplazo atómico: los hilos que ya tenían el modelo anterior terminan su predicción con él
+        self._recognizer = recognizer
+        self._stamp = stamp
+        self.version += 1
+        elapsed = time.perf_counter() - start
+        MODEL_BYTES.set(stamp[1])
+        MODEL_HISTOGRAMS.set(len(labels) if labels is not None else 0)
+        MODEL_LOAD_SECONDS.set(elapsed)
+        print(f"[INFO] Modelo cargado (versión {self.version}, {type(recognizer).__name__}) en {elapsed:.2f}s")
+
+    def _after_fork(self):
+        # Un fork durante una recarga dejaría el lock tomado y la recarga sin hilo en el hijo
+        self._lock = threading.Lock()
+        self._reloading = False
@@ -0,0 +1,194 @@
+import queue
+import threading
+import time
+from collections import deque
+
+from face_recognition.metrics import VISION_STAGE_SECONDS, VISION_FRAMES
+
+class StageStats:
+    """
+    Latencias por etapa (ventana móvil) y FPS sostenido de un pipeline de video.
+    Es seguro llamarla desde varios hilos. Cada medición también se acumula en las métricas del
+    proceso (vision_etapa_segundos) con la etiqueta fuente=source.
+    """
+
+    def __init__(self, window=120, source=''):
+        self.source = source
+        self._lock = threading.Lock()
+        self._window = window
+        self._latencias = {}
+        self._entregados = deque(maxlen=window)
+        self.frames = 0
+        self.descartados = 0
+
+    def record(self, stage, seconds):
+        VISION_STAGE_SECONDS.observe(seconds, fuente=self.source, etapa=stage)
+        with self._lock:
+            self._latencias.setdefault(stage, deque(maxlen=self._window)).append(seconds)
+
+    def tick(self):
+        """Marca un frame procesado de punta a punta."""
+        VISION_FRAMES.inc(fuente=self.source)
+        with self._lock:
+            self.frames += 1
+            self._entregados.append(time.perf_counter())
+
+    def drop(self):
+        with self._lock:
+            self.descartados += 1
+
+    def fps(self):
+        with self._lock:
+            if len(self._entregados) < 2:
+                return 0.0
+            elapsed = self._entregados[-1] - self._entregados[0]
+            return (len(self._entregados) - 1) / elapsed if elapsed > 0 else 0.0
+
+    def snapshot(self):
+        fps = self.fps()
+        with self._lock:
+            latencias = {
+                stage: {
+                    'media_ms': round(1000 * sum(values) / len(values), 2),
+                    'max_ms': round(1000 * max(values), 2),
+                }
+                for stage, values in self._latencias.items() if values
+            }
+            return {'fps': round(fps, 2), 'frames': self.frames, 'descartados': self.descartados, 'latencias': latencias}
+
+def _put_latest(q, item, stats):
+    # Si la cola está llena se descarta el elemento más viejo: siempre se procesa lo más reciente
+    while True:
+        try:
+            q.put_nowait(item)
+            return
+        except queue.Full:
+            try:
+                q.get_nowait()
+                stats.drop()
+            except queue.Empty:
+                pass
+
+def _put_blocking(q, item, stop):
+    # Espera lugar en la cola sin descartar nada; se rinde solo si se detiene el pipeline
+    while not stop.is_set():
+        try:
+            q.put(item, timeout=0.1)
+            return
+        except queue.Full:
+            pass
+
+class FramePipeline:
+    """
+    Pipeline de captura y procesamiento en paralelo:
+
+    - un hilo lee la cámara sin pausa y deja solo los frames más recientes en una cola acotada;
+    - un pool de hilos toma esos frames y ejecuta process_fn(frame) (detección y reconocimiento);
+    - results() entrega (frame, resultado) en orden, descartando los resultados que llegan tarde.
+
+    Con live=False (archivos de video y directorios grabados) no se descarta nada: la lectura espera
+    a que haya lugar en la cola y results() entrega todos los frames en orden, así el resultado
+    no depende de la velocidad de la máquina.
+
+    process_factory() se llama una vez por hilo, para que cada uno tenga su propio detector.
+    """
+
+    def __init__(self, cap, process_factory, workers=2, stats=None, live=True):
+        if workers < 1:
+            # Con 0 las colas serían ilimitadas y nadie procesaría los frames
+            raise ValueError('workers debe ser al menos 1')
+        self.cap = cap
+        self.stats = stats or StageStats()
+        self.live = live
+        self._process_factory = process_factory
+        self._frames = queue.Queue(maxsize=workers)
+        self._results = queue.Queue(maxsize=2 * workers)
+        self._stop = threading.Event()
+        self._capture_done = threading.Event()
+        self._error = None
+        self._threads = [threading.Thread(target=self._grab, name='pipeline-captura', daemon=True)]
+        self._threads += [threading.Thread(target=self._work, name=f'pipeline-worker-{i}', daemon=True)
+                          for i in range(workers)]
+
+    def start(self):
+        for t in self._threads:
+            t.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        for t in self._threads:
+            t.join(timeout=2)
+
+    def _put(self, q, item):
+        if self.live:
+            _put_latest(q, item, self.stats)
+        else:
+            _put_blocking(q, item, self._stop)
+
+    def _grab(self):
+        frame_id = 0
+        while not self._stop.is_set():
+            start = time.perf_counter()
+            ret, frame = self.cap.read()
+            if not ret:
+                print("Error al leer el frame de la cámara.")
+                break
+            self.stats.record('captura', time.perf_counter() - start)
+            frame_id += 1
+            self._put(self._frames, (frame_id, start, frame))
+        self._capture_done.set()
+
+    def _work(self):
+        try:
+            process_fn = self._process_factory()
+            while not self._stop.is_set():
+                try:
+                    frame_id, grabbed_at, frame = self._frames.get(timeout=0.1)
+                except queue.Empty:
+                    if self._capture_done.is_set():
+                        return
+                    continue
+                start = time.perf_counter()
+                result = process_fn(frame)
+                self.stats.record('procesamiento', time.perf_counter() - start)
+                self._put(self._results, (frame_id, grabbed_at, frame, result))
+        except Exception as e:
+            # Un error en un worker detiene todo el pipeline y se relanza desde results()
+            self._error = e
+            self._stop.set()
+
+    def results(self, cancel_event=None):
+        """
+        Generador de (frame, resultado) en orden de captura. Termina al llamar stop(), si la cámara
+        falla o si se activa cancel_event, aunque no lleguen frames.
+        """
+        last_id = 0
+        waiting = {} # Sin descartes: resultados que se adelantaron al siguiente frame_id esperado
+        while not self._stop.is_set() and not (cancel_event is not None and cancel_event.is_set()):
+            try:
+                item = self._results.get(timeout=0.1)
+            except queue.Empty:
+                if self._capture_done.is_set() and self._frames.empty() and \
+                        not any(t.is_alive() for t in self._threads[1:]):
+                    return
+                continue
+            if not self.live:
+                waiting[item[0]] = item
+                while last_id + 1 in waiting:
+                    last_id, grabbed_at, frame, result = waiting.pop(last_id + 1)
+                    self.stats.record('total', time.perf_counter() - grabbed_at)
+                    self.stats.tick()
+                    yield frame, result
+                continue
+            frame_id, grabbed_at, frame, result = item
+            if frame_id < last_id:
+                # Un worker más lento terminó un frame que ya quedó viejo
+                self.stats.drop()
+                continue
+            last_id = frame_id
+            self.stats.record('total', time.perf_counter() - grabbed_at)
+            self.stats.tick()
+            yield frame, result
+        if self._error is not None:
+            raise self._error
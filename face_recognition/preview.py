@@ -0,0 +1,77 @@
+import threading
+import time
+
+import cv2
+
+PREVIEW_MAX_FPS = 10 # Frames por segundo máximos que se codifican para la vista previa
+JPEG_QUALITY = 70
+KEEPALIVE = 5 # Segundos sin frames nuevos antes de reenviar el último (detecta clientes desconectados)
+
+BOUNDARY = 'frame'
+
+class PreviewStream:
+    """
+    Vista previa MJPEG de una fuente de video.
+
+    El bucle de reconocimiento pregunta wants_frame() antes de dibujar: solo hay que anotar y
+    codificar un frame si hay al menos un cliente conectado y pasó 1/max_fps desde el último.
+    Sin clientes la vista previa no cuesta nada.
+    """
+
+    def __init__(self, max_fps=PREVIEW_MAX_FPS, quality=JPEG_QUALITY):
+        self.max_fps = max_fps
+        self.quality = quality
+        self.clients = 0
+        self.encoded = 0
+        self._jpeg = None
+        self._seq = 0
+        self._last = 0.0
+        self._cond = threading.Condition()
+
+    def wants_frame(self):
+        if self.clients <= 0:
+            return False
+        return time.monotonic() - self._last >= 1 / self.max_fps
+
+    def publish(self, frame):
+        """Codifica el frame (ya anotado) en JPEG y despierta a los clientes."""
+        self._last = time.monotonic()
+        ok, buffer = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, self.quality])
+        if not ok:
+            return
+        with self._cond:
+            self._jpeg = buffer.tobytes()
+            self._seq += 1
+            self.encoded += 1
+            self._cond.notify_all()
+
+    def frames(self):
+        """Generador de partes multipart/x-mixed-replace para un cliente."""
+        with self._cond:
+            self.clients += 1
+        try:
+            seq = 0
+            while True:
+                with self._cond:
+                    self._cond.wait_for(lambda: self._seq != seq, timeout=KEEPALIVE)
+                    seq, jpeg = self._seq, self._jpeg
+                if jpeg is None:
+                    # Todavía no hay imagen; el comentario vacío sirve para notar si el cliente se fue
+                    yield b'\r\n'
+                    continue
+                yield (b'--' + BOUNDARY.encode() + b'\r\nContent-Type: image/jpeg\r\n'
+                       b'Content-Length: ' + str(len(jpeg)).encode() + b'\r\n\r\n' + jpeg + b'\r\n')
+        finally:
+            with self._cond:
+                self.clients -= 1
+
+_previews = {}
+_previews_lock = threading.Lock()
+
+def get_preview(name, max_fps=PREVIEW_MAX_FPS, quality=JPEG_QUALITY):
+    """Vista previa de la fuente `name` (ver source_name), compartida entre el reconocimiento y las rutas."""
+    with _previews_lock:
+        preview = _previews.get(name)
+        if preview is None:
+            preview = _previews[name] = PreviewStream(max_fps, quality)
+        return preview
@@ -0,0 +1,113 @@
+import multiprocessing as mp
+import queue
+import time
+
+from face_recognition import face_recognizer
+from face_recognition.metrics import REGISTRY
+from face_recognition.video_sources import source_name
+
+# Cada cuánto (en segundos) un proceso de fuente informa su avance al proceso principal
+PROGRESS_INTERVAL = 1.0
+
+def _source_worker(name, source, alumno_id_map, threshold, options, stop_event, results):
+    # Con fork el modelo compartido ya viene cargado del proceso principal
+    recognizer = face_recognizer.get_model_holder().get()
+    last_report = [0.0]
+
+    def progress(**data):
+        now = time.monotonic()
+        if now - last_report[0] >= PROGRESS_INTERVAL:
+            last_report[0] = now
+            results.put(('progreso', name, dict(data, metricas=REGISTRY.dump())))
+
+    try:
+        if recognizer is None:
+            results.put(('error', name, 'No se pudo cargar el modelo de entrenamiento'))
+            return
+        summary = face_recognizer.recognize_face(alumno_id_map, threshold, progress=progress, cancel_event=stop_event,
+                                                 source=source, display=False, **options)
+        if summary is None:
+            results.put(('error', name, f'No se pudo abrir la fuente de video {source}'))
+        else:
+            results.put(('fin', name, summary))
+    except Exception as e:
+        results.put(('error', name, str(e)))
+    finally:
+        # Enviar las asistencias que hayan quedado en cola antes de que termine el proceso
+        face_recognizer.get_attendance_sender().close()
+        results.put(('metricas', name, REGISTRY.dump()))
+
+def run_recognition_service(sources, alumno_id_map, threshold=60, progress=None, cancel_event=None, **options):
+    """
+    Ejecuta el reconocimiento sobre varias fuentes de video a la vez, una por proceso.
+
+    El modelo se carga una sola vez en este proceso; con el método de inicio 'fork' los hijos lo
+    heredan sin volver a leer trainer.yml, y cada uno lo recarga por su cuenta si se reentrena. Cada fuente registra asistencias por su cuenta y reporta
+    sus estadísticas y métricas; progress(fuentes={nombre: estado}) recibe el estado de todas.
+    options se pasa a recognize_face (pipelined, workers, detection_options).
+    Devuelve {nombre de fuente: {'estado', 'stats' o 'error'}}.
+    """
+    ctx = mp.get_context('fork') if 'fork' in mp.get_all_start_methods() else mp.get_context()
+    if ctx.get_start_method() == 'fork' and face_recognizer.get_model_holder().get() is None:
+        return None
+
+    stop_event = ctx.Event()
+    results = ctx.Queue()
+    processes = {}
+    for i, source in enumerate(sources):
+        name = source_name(source)
+        if name in processes:
+            name = f'{name}-{i}' # Dos fuentes con el mismo nombre corto
+        processes[name] = ctx.Process(target=_source_worker, name=f'reconocimiento-{name}', daemon=True,
+                                      args=(name, source, alumno_id_map, threshold, options, stop_event, results))
+    estado = {name: {'estado': 'en_curso', 'stats': None} for name in processes}
+
+    print(f"\n[INFO] Iniciando servicio de reconocimiento con {len(processes)} fuentes: {', '.join(processes)}")
+    try:
+        for process in processes.values():
+            process.start()
+
+        def handle(kind, name, data):
+            # Métricas del hijo: se suman al exportar mientras corre y se incorporan al terminar
+            metrics_key = (name, processes[name].pid)
+            if kind == 'metricas':
+                REGISTRY.set_remote(metrics_key, data)
+                REGISTRY.absorb(metrics_key)
+                return
+            if kind == 'progreso':
+                REGISTRY.set_remote(metrics_key, data.pop('metricas'))
+                estado[name]['stats'] = data.get('stats')
+                estado[name]['reconocidos'] = data.get('reconocidos')
+            elif kind == 'fin':
+                estado[name].update(estado='finalizado', stats=data)
+            else:
+                estado[name].update(estado='fallido', error=data)
+                print(f"[ERROR] Fuente {name}: {data}")
+            if progress:
+                progress(fuentes=estado)
+
+        while any(p.is_alive() for p in processes.values()):
+            if cancel_event is not None and cancel_event.is_set():
+                stop_event.set()
+            try:
+                handle(*results.get(timeout=0.5))
+            except queue.Empty:
+                continue
+        # Mensajes que quedaron en la cola después de que terminaron los procesos
+        while True:
+            try:
+                handle(*results.get(timeout=0.1))
+            except queue.Empty:
+                break
+    finally:
+        stop_event.set()
+        for name, process in processes.items():
+            process.join(timeout=5)
+            # Un hijo que murió sin mandar sus métricas finales deja las del último avance
+            REGISTRY.absorb((name, process.pid))
+
+    for name, process in processes.items():
+        if estado[name]['estado'] == 'en_curso':
+            estado[name].update(estado='fallido', error=f'El proceso terminó con código {process.exitcode}')
+    print("\n[INFO] Servicio de reconocimiento finalizado.")
+    return estado
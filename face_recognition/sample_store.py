@@ -0,0 +1,151 @@
+import os
+import time
+
+import cv2
+import numpy as np
+
+from face_recognition.face_quality import FACE_SIZE, normalize_face, sharpness, dhash
+
+# Archivos de un almacén de muestras dentro de datasets/<id>/
+SAMPLES_FILE = 'samples.u8' # Muestras en escala de grises, una detrás de otra, todas del mismo tamaño
+INDEX_FILE = 'index.npz' # Tamaño de las muestras y una fila por muestra
+STORE_FILES = (SAMPLES_FILE, INDEX_FILE)
+
+INDEX_DTYPE = np.dtype([('label', '<i4'), ('timestamp', '<f8'), ('quality', '<f4'), ('hash', '<u8')])
+
+# Clave con la que el entrenamiento identifica una muestra empaquetada: <ruta de samples.u8>#<n>
+KEY_SEPARATOR = '#'
+
+def has_store(directory):
+    return os.path.exists(os.path.join(directory, INDEX_FILE))
+
+def sample_key(directory, n):
+    return f'{os.path.join(directory, SAMPLES_FILE)}{KEY_SEPARATOR}{n}'
+
+def parse_sample_key(key):
+    """Devuelve (directorio, n) de una clave de muestra empaquetada, o None si es la ruta de un archivo."""
+    path, sep, n = key.rpartition(KEY_SEPARATOR)
+    if not sep or os.path.basename(path) != SAMPLES_FILE or not n.isdigit():
+        return None
+    return os.path.dirname(path), int(n)
+
+class SampleStore:
+    """
+    Muestras de un alumno empaquetadas en un único arreglo uint8 de forma (n, alto, ancho).
+
+    samples.u8 solo crece: append() escribe las muestras nuevas al final y recién después reemplaza
+    el índice (de forma atómica), así que el índice nunca apunta a bytes a medio escribir. load()
+    devuelve un numpy.memmap de solo lectura: leer muestras no copia ni decodifica nada.
+    """
+
+    def __init__(self, directory, shape=FACE_SIZE[::-1]):
+        self.directory = directory
+        self.samples_path = os.path.join(directory, SAMPLES_FILE)
+        self.index_path = os.path.join(directory, INDEX_FILE)
+        self.shape = tuple(shape) # (alto, ancho)
+        self.index = np.zeros(0, dtype=INDEX_DTYPE)
+        if os.path.exists(self.index_path):
+            with np.load(self.index_path) as data:
+                self.index = data['index']
+                self.shape = tuple(int(v) for v in data['shape'])
+
+    def __len__(self):
+        return len(self.index)
+
+    @property
+    def sample_bytes(self):
+        return self.shape[0] * self.shape[1]
+
+    def load(self):
+        """Muestras como memmap (n, alto, ancho), sin leerlas a memoria."""
+        if not len(self.index):
+            return np.zeros((0,) + self.shape, dtype=np.uint8)
+        return np.memmap(self.samples_path, dtype=np.uint8, mode='r', shape=(len(self.index),) + self.shape)
+
+    def append(self, faces, label, qualities=None, hashes=None, timestamp=None):
+        """Agrega rostros (se llevan al tamaño del almacén) con su etiqueta, calidad y hash perceptual."""
+        if not len(faces):
+            return
+        faces = [self._fit(face) for face in faces]
+        rows = np.zeros(len(faces), dtype=INDEX_DTYPE)
+        rows['label'] = int(label)
+        rows['timestamp'] = time.time() if timestamp is None else timestamp
+        rows['quality'] = qualities if qualities is not None else [sharpness(face) for face in faces]
+        rows['hash'] = hashes if hashes is not None else [dhash(face) for face in faces]
+
+        os.makedirs(self.directory, exist_ok=True)
+        with open(self.samples_path, 'ab') as f:
+            # Descartar bytes de una escritura anterior que no llegó a registrarse en el índice
+            f.truncate(len(self.index) * self.sample_bytes)
+            for face in faces:
+                f.write(np.ascontiguousarray(face, dtype=np.uint8).tobytes())
+            f.flush()
+            os.fsync(f.fileno())
+        self._write_index(np.concatenate([self.index, rows]))
+
+    def _fit(self, face):
+        if face.shape == self.shape:
+            return face
+        if self.shape[::-1] == FACE_SIZE:
+            return normalize_face(face)
+        return cv2.resize(face, self.shape[::-1], interpolation=cv2.INTER_AREA)
+
+    def _write_index(self, index):
+        # np.savez agrega .npz si el nombre no lo tiene, por eso el temporal termina en .npz
+        tmp_path = os.path.join(self.directory, f'.index.{os.getpid()}.tmp.npz')
+        np.savez(tmp_path, index=index, shape=np.array(self.shape))
+        os.replace(tmp_path, self.index_path)
+        self.index = index
+
+def convert_directory(directory, remove=False):
+    """
+    Empaqueta las imágenes user_<id>_<n>.jpg de un directorio de alumno en su almacén.
+    Con remove=True borra las imágenes ya empaquetadas. Devuelve cuántas se agregaron.
+
+    Una vez que un directorio tiene almacén, el entrenamiento ignora sus JPEG; las imágenes que ya
+    estaban empaquetadas (misma etiqueta y fecha de modificación) no se vuelven a agregar.
+    """
+    # Import diferido: dataset_loader importa este módulo para leer los almacenes
+    from face_recognition.dataset_loader import parse_sample_label
+
+    store = SampleStore(directory)
+    already_packed = set(zip(store.index['label'].tolist(), store.index['timestamp'].tolist()))
+    paths = sorted(os.path.join(directory, f) for f in os.listdir(directory) if parse_sample_label(f) is not None)
+    faces, labels, mtimes, packed = [], [], [], []
+    for path in paths:
+        label, mtime = parse_sample_label(path), os.path.getmtime(path)
+        if (label, mtime) not in already_packed:
+            img = cv2.imread(path, cv2.IMREAD_GRAYSCALE)
+            if img is None or img.size == 0:
+                print(f"[WARN] Se omite {path}: imagen ilegible")
+                continue
+            faces.append(img)
+            labels.append(label)
+            mtimes.append(mtime)
+        packed.append(path)
+
+    # Normalmente todas las imágenes de un directorio son del mismo alumno, pero se respeta el nombre de cada una
+    for label in sorted(set(labels)):
+        group = [i for i, l in enumerate(labels) if l == label]
+        store.append([faces[i] for i in group], label, timestamp=[mtimes[i] for i in group])
+    if remove:
+        for path in packed:
+            os.remove(path)
+    return len(faces)
+
+def convert_datasets(datasets_path, remove=False):
+    """Empaqueta todos los directorios de alumnos de datasets_path. Devuelve {directorio: muestras agregadas}."""
+    result = {}
+    for name in sorted(os.listdir(datasets_path)):
+        directory = os.path.join(datasets_path, name)
+        if not os.path.isdir(directory):
+            continue
+        start = time.perf_counter()
+        result[name] = convert_directory(directory, remove=remove)
+        print(f"[INFO] {name}: {result[name]} imágenes empaquetadas en {time.perf_counter() - start:.2f}s")
+    return result
+
+if __name__ == '__main__':
+    # Uso: python -m face_recognition.sample_store [--borrar-jpg]
+    import sys
+    convert_datasets('./face_recognition/datasets', remove='--borrar-jpg' in sys.argv)
@@ -0,0 +1,107 @@
+import os
+import time
+
+import cv2
+
+from face_recognition.sample_store import SampleStore, has_store
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp')
+
+class ImageDirectorySource:
+    """
+    Reproduce las imágenes de un directorio (en orden alfabético) como si fueran frames de una cámara.
+    Con fps > 0 respeta ese ritmo; con loop=True vuelve a empezar al terminar.
+    """
+
+    def __init__(self, path, fps=0, loop=False):
+        self.paths = sorted(os.path.join(path, f) for f in os.listdir(path)
+                            if f.lower().endswith(IMAGE_EXTENSIONS))
+        self.fps = fps
+        self.loop = loop
+        self._index = 0
+        self._last = None
+
+    def isOpened(self):
+        return bool(self.paths)
+
+    def read(self):
+        while True:
+            if self._index >= len(self.paths):
+                if not self.loop or not self.paths:
+                    return False, None
+                self._index = 0
+            index = self._index
+            self._index += 1
+            frame = self._frame(index)
+            if frame is None:
+                continue
+            if frame.ndim == 2:
+                frame = cv2.cvtColor(frame, cv2.COLOR_GRAY2BGR)
+            self._throttle()
+            return True, frame
+
+    def release(self):
+        self.paths = []
+
+    def _frame(self, index):
+        path = self.paths[index]
+        frame = cv2.imread(path)
+        if frame is None:
+            print(f"[WARN] Se omite {path}: imagen ilegible")
+        return frame
+
+    def _throttle(self):
+        if self.fps <= 0:
+            return
+        now = time.perf_counter()
+        if self._last is not None:
+            wait = 1 / self.fps - (now - self._last)
+            if wait > 0:
+                time.sleep(wait)
+        self._last = time.perf_counter()
+
+class SampleStoreSource(ImageDirectorySource):
+    """Reproduce las muestras de un almacén empaquetado (datasets/<id>/samples.u8) como frames."""
+
+    def __init__(self, path, fps=0, loop=False):
+        self.samples = SampleStore(path).load()
+        self.paths = range(len(self.samples))
+        self.fps = fps
+        self.loop = loop
+        self._index = 0
+        self._last = None
+
+    def _frame(self, index):
+        return self.samples[index]
+
+def open_source(source, fps=0, loop=False):
+    """
+    Abre una fuente de video con la interfaz de cv2.VideoCapture (isOpened/read/release):
+
+    - un entero (o un texto numérico como '0'): cámara con ese índice;
+    - un directorio: sus muestras empaquetadas (SampleStoreSource) o, si no tiene almacén, sus
+      imágenes reproducidas en orden (ImageDirectorySource);
+    - cualquier otro texto: archivo de video o URL que entienda OpenCV.
+    """
+    if isinstance(source, int) or (isinstance(source, str) and source.isdigit()):
+        return cv2.VideoCapture(int(source))
+    if os.path.isdir(source) and has_store(source):
+        return SampleStoreSource(source, fps=fps, loop=loop)
+    if os.path.isdir(source):
+        return ImageDirectorySource(source, fps=fps, loop=loop)
+    return cv2.VideoCapture(source)
+
+def is_live_source(source):
+    """
+    True para cámaras y streams (URL), cuyos frames se pierden si no se leen a tiempo; False para
+    archivos de video y directorios, que se pueden procesar completos a cualquier velocidad.
+    """
+    if isinstance(source, int) or (isinstance(source, str) and source.isdigit()):
+        return True
+    return not os.path.exists(source)
+
+def source_name(source):
+    """Nombre corto de una fuente para ventanas y estadísticas."""
+    if isinstance(source, int) or (isinstance(source, str) and source.isdigit()):
+        return f'camara{source}'
+    return os.path.basename(os.path.normpath(str(source))) or str(source)
@@ -0,0 +1,117 @@
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+# Estados posibles de un trabajo
+PENDIENTE = 'pendiente'
+EN_CURSO = 'en_curso'
+COMPLETADO = 'completado'
+FALLIDO = 'fallido'
+CANCELADO = 'cancelado'
+
+class RecursoOcupado(Exception):
+    """El recurso pedido (cámara, entrenador, ...) ya está siendo usado por otro trabajo."""
+
+    def __init__(self, recurso, job_id):
+        super().__init__(f"El recurso '{recurso}' está en uso por el trabajo {job_id}")
+        self.recurso = recurso
+        self.job_id = job_id
+
+class Job:
+    def __init__(self, tipo, recurso, propietario=None):
+        self.id = uuid.uuid4().hex
+        self.tipo = tipo
+        self.recurso = recurso
+        self.propietario = propietario # id del usuario que lo inició
+        self.estado = PENDIENTE
+        self.progreso = {}
+        self.resultado = None
+        self.error = None
+        self.creado = time.time()
+        self.iniciado = None
+        self.finalizado = None
+        self.cancel_event = threading.Event()
+
+    def report(self, **progreso):
+        """Callback de progreso que reciben las funciones de visión (frames capturados, imágenes cargadas, ...)."""
+        self.progreso.update(progreso)
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'tipo': self.tipo,
+            'recurso': self.recurso,
+            'propietario': self.propietario,
+            'estado': self.estado,
+            'progreso': dict(self.progreso),
+            'resultado': self.resultado,
+            'error': self.error,
+            'creado': self.creado,
+            'iniciado': self.iniciado,
+            'finalizado': self.finalizado,
+        }
+
+class JobManager:
+    """
+    Ejecuta trabajos largos (captura, entrenamiento, reconocimiento) en un pool acotado de hilos
+    para que los workers web respondan de inmediato. Cada recurso admite un solo trabajo a la vez.
+    """
+
+    def __init__(self, max_workers=3, max_historial=100):
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='job')
+        self._lock = threading.Lock()
+        self._jobs = OrderedDict()
+        self._recursos = {} # recurso -> id del trabajo que lo ocupa
+        self._max_historial = max_historial
+
+    def submit(self, tipo, recurso, fn, propietario=None):
+        """
+        Encola fn(job). Lanza RecursoOcupado si el recurso ya tiene un trabajo activo.
+        """
+        job = Job(tipo, recurso, propietario)
+        with self._lock:
+            if recurso in self._recursos:
+                raise RecursoOcupado(recurso, self._recursos[recurso])
+            self._recursos[recurso] = job.id
+            self._jobs[job.id] = job
+            self._purgar()
+        self._executor.submit(self._run, job, fn)
+        return job
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def cancel(self, job_id):
+        """Pide la cancelación cooperativa del trabajo. Devuelve False si no existe o ya terminó."""
+        job = self.get(job_id)
+        if job is None or job.finalizado is not None:
+            return False
+        job.cancel_event.set()
+        return True
+
+    def _run(self, job, fn):
+        job.iniciado = time.time()
+        try:
+            if job.cancel_event.is_set():
+                job.estado = CANCELADO
+                return
+            job.estado = EN_CURSO
+            job.resultado = fn(job)
+            job.estado = CANCELADO if job.cancel_event.is_set() else COMPLETADO
+        except Exception as e:
+            job.estado = FALLIDO
+            job.error = str(e)
+            print(f"[ERROR] El trabajo {job.id} ({job.tipo}) falló: {e}")
+        finally:
+            job.finalizado = time.time()
+            with self._lock:
+                self._recursos.pop(job.recurso, None)
+
+    def _purgar(self):
+        # Descartar los trabajos terminados más antiguos para acotar la memoria
+        terminados = [j.id for j in self._jobs.values() if j.finalizado is not None]
+        for job_id in terminados[:max(0, len(self._jobs) - self._max_historial)]:
+            del self._jobs[job_id]
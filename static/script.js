@@ -23,12 +23,28 @@ document.addEventListener('DOMContentLoaded', () => {
     const preceptorForm = document.getElementById('preceptor-form');
     const preceptoresTableBody = document.querySelector('#preceptores-table tbody');
 
-    // Función para cargar los alumnos
-    async function cargarAlumnos() {
+    // Los listados se cargan de a una página; el botón "Cargar más" pide la siguiente
+    const TAMANO_PAGINA = 100;
+    const alumnosCargarMas = document.getElementById('alumnos-cargar-mas');
+    const asistenciasCargarMas = document.getElementById('asistencias-cargar-mas');
+    let alumnosSiguiente = null; // Cursor de la página siguiente, o null si no hay más
+    let asistenciasSiguiente = null;
+
+    function mostrarCargarMas(boton, siguiente) {
+        if (boton) boton.style.display = siguiente ? '' : 'none';
+    }
+
+    // Función para cargar los alumnos: sin cursor carga la primera página, con cursor agrega la siguiente
+    async function cargarAlumnos(cursor = null) {
         try {
-            const response = await fetch('/alumnos');
-            const alumnos = await response.json();
-            alumnosTableBody.innerHTML = '';
+            // 'no-cache' hace que el navegador revalide con el ETag y reutilice su copia si el servidor responde 304.
+            const url = `/alumnos?limit=${TAMANO_PAGINA}` + (cursor ? `&cursor=${cursor}` : '');
+            const response = await fetch(url, { cache: 'no-cache' });
+            const pagina = await response.json();
+            const alumnos = pagina.alumnos;
+            if (!cursor) alumnosTableBody.innerHTML = '';
+            alumnosSiguiente = pagina.siguiente;
+            mostrarCargarMas(alumnosCargarMas, alumnosSiguiente);
             
             let filteredAlumnos = alumnos;
 
@@ -190,28 +206,91 @@ document.addEventListener('DOMContentLoaded', () => {
 
     // --- Funciones para Asistencia (Solo Preceptor) ---
 
-    // Función para cargar las asistencias
-    async function cargarAsistencias() {
+    // Mientras se carga una página, los eventos de /asistencias/stream se guardan acá y se aplican
+    // al terminar (si no, una fila recibida a mitad de la carga quedaría duplicada)
+    let eventosPendientes = null;
+    let cargaAsistencias = 0; // Número de la última carga; una recarga completa deja sin efecto a las anteriores
+    let cargandoAsistencias = false;
+
+    // Función para cargar las asistencias: sin cursor carga la primera página (las más recientes),
+    // con cursor agrega la siguiente al final de la tabla
+    async function cargarAsistencias(cursor = null) {
         if (currentUserRole !== 'preceptor') return; // Solo preceptores ven y cargan asistencias
+        if (!asistenciasTableBody) return; // Asegurarse de que el elemento existe
+        if (cursor && cargandoAsistencias) return; // "Cargar más" espera a que termine la carga en curso
 
+        const carga = ++cargaAsistencias;
+        cargandoAsistencias = true;
+        if (!eventosPendientes) eventosPendientes = [];
         try {
-            const response = await fetch('/asistencias');
-            const asistencias = await response.json();
-            if (asistenciasTableBody) { // Asegurarse de que el elemento existe
-                asistenciasTableBody.innerHTML = '';
-                asistencias.forEach(asistencia => {
-                    const row = asistenciasTableBody.insertRow();
-                    row.insertCell(0).textContent = asistencia.id;
-                    row.insertCell(1).textContent = asistencia.alumno_id;
-                    row.insertCell(2).textContent = asistencia.fecha;
-                    row.insertCell(3).textContent = asistencia.estado;
-                });
-            }
+            const url = `/asistencias?limit=${TAMANO_PAGINA}` + (cursor ? `&cursor=${cursor}` : '');
+            const response = await fetch(url);
+            const pagina = await response.json();
+            if (carga !== cargaAsistencias) return; // Una recarga posterior reemplaza a esta
+            if (!cursor) asistenciasTableBody.innerHTML = '';
+            pagina.asistencias.forEach(asistencia => {
+                // Una fila que llegó antes por el stream pasa a su lugar en el listado
+                const existente = asistenciasTableBody.querySelector(`tr[data-id="${asistencia.id}"]`);
+                if (existente) existente.remove();
+                llenarFilaAsistencia(asistenciasTableBody.insertRow(), asistencia);
+            });
+            asistenciasSiguiente = pagina.siguiente;
+            mostrarCargarMas(asistenciasCargarMas, asistenciasSiguiente);
         } catch (error) {
             console.error('Error al cargar asistencias:', error);
+        } finally {
+            if (carga === cargaAsistencias) {
+                cargandoAsistencias = false;
+                const pendientes = eventosPendientes;
+                eventosPendientes = null;
+                pendientes.forEach(aplicar => aplicar());
+            }
+        }
+    }
+
+    if (alumnosCargarMas) alumnosCargarMas.addEventListener('click', () => cargarAlumnos(alumnosSiguiente));
+    if (asistenciasCargarMas) asistenciasCargarMas.addEventListener('click', () => cargarAsistencias(asistenciasSiguiente));
+
+    function llenarFilaAsistencia(row, asistencia) {
+        row.dataset.id = asistencia.id;
+        row.innerHTML = '';
+        row.insertCell(0).textContent = asistencia.id;
+        row.insertCell(1).textContent = asistencia.alumno_id;
+        row.insertCell(2).textContent = asistencia.fecha;
+        row.insertCell(3).textContent = asistencia.estado;
+    }
+
+    // Aplica en la tabla una asistencia nueva o modificada recibida por /asistencias/stream
+    function aplicarAsistencia(asistencia) {
+        const existente = asistenciasTableBody.querySelector(`tr[data-id="${asistencia.id}"]`);
+        if (existente) {
+            llenarFilaAsistencia(existente, asistencia);
+        } else {
+            llenarFilaAsistencia(asistenciasTableBody.insertRow(0), asistencia); // El listado va de la más reciente a la más antigua
         }
     }
 
+    // Recibe las asistencias de los cursos del preceptor a medida que se registran, en lugar de
+    // volver a pedir el listado completo. EventSource se reconecta solo y reanuda con Last-Event-ID.
+    let asistenciasEventos = null;
+    function escucharAsistencias() {
+        if (asistenciasEventos || !window.EventSource || !asistenciasTableBody) return;
+        asistenciasEventos = new EventSource('/asistencias/stream');
+        // Con una carga en curso el evento se aplica cuando termine, en el mismo orden en que llegó
+        const alRecibir = aplicar => e => {
+            if (eventosPendientes) eventosPendientes.push(() => aplicar(e));
+            else aplicar(e);
+        };
+        asistenciasEventos.addEventListener('asistencia', alRecibir(e => aplicarAsistencia(JSON.parse(e.data))));
+        asistenciasEventos.addEventListener('asistencia_eliminada', alRecibir(e => {
+            const fila = asistenciasTableBody.querySelector(`tr[data-id="${JSON.parse(e.data).id}"]`);
+            if (fila) fila.remove();
+        }));
+        // Se perdieron eventos (reinicio del servidor o desconexión larga): recargar todo. Una
+        // recarga deja sin efecto a la que estuviera en curso
+        asistenciasEventos.addEventListener('recargar', () => cargarAsistencias());
+    }
+
     // --- Funciones para Preceptores (Admin solo) ---
 
     // Función para cargar preceptores
@@ -325,6 +404,30 @@ document.addEventListener('DOMContentLoaded', () => {
 
     // --- Funciones de Reconocimiento Facial ---
 
+    // Consulta periódicamente el estado de un trabajo en segundo plano hasta que termine
+    async function seguirJob(jobId, descripcion, alTerminar) {
+        try {
+            const response = await fetch(`/jobs/${jobId}`);
+            const job = await response.json();
+            if (!response.ok) {
+                console.error(`Error al consultar ${descripcion}:`, job.error);
+                return;
+            }
+            if (job.estado === 'pendiente' || job.estado === 'en_curso') {
+                console.log(`${descripcion}: ${job.estado}`, job.progreso);
+                setTimeout(() => seguirJob(jobId, descripcion, alTerminar), 2000);
+                return;
+            } else if (job.estado === 'fallido') {
+                alert(`${descripcion} falló: ${job.error}`);
+            } else {
+                alert(`${descripcion}: ${job.estado}.`);
+            }
+            if (alTerminar) alTerminar();
+        } catch (error) {
+            console.error('Error en la solicitud:', error);
+        }
+    }
+
     async function capturarRostros(alumnoId) {
         if (!confirm(`¿Iniciar captura de rostros para el alumno ID ${alumnoId}?`)) return;
         try {
@@ -332,6 +435,9 @@ document.addEventListener('DOMContentLoaded', () => {
             const data = await response.json();
             if (response.ok) {
                 alert(data.mensaje);
+                seguirJob(data.job_id, 'Captura de rostros');
+            } else if (response.status === 409) {
+                alert('Ya hay un trabajo en curso que usa el mismo recurso: ' + data.error);
             } else {
                 alert('Error al iniciar captura de rostros: ' + data.error);
             }
@@ -348,6 +454,9 @@ document.addEventListener('DOMContentLoaded', () => {
             const data = await response.json();
             if (response.ok) {
                 alert(data.mensaje);
+                seguirJob(data.job_id, 'Entrenamiento');
+            } else if (response.status === 409) {
+                alert('Ya hay un trabajo en curso que usa el mismo recurso: ' + data.error);
             } else {
                 alert('Error al entrenar reconocedor: ' + data.error);
             }
@@ -357,6 +466,50 @@ document.addEventListener('DOMContentLoaded', () => {
         }
     }
 
+    // La vista previa solo se genera en el servidor mientras la imagen está conectada al stream
+    function mostrarVistaPrevia(url) {
+        document.getElementById('preview-reconocimiento-img').src = url;
+        document.getElementById('preview-reconocimiento').style.display = 'block';
+    }
+
+    function cerrarVistaPrevia() {
+        document.getElementById('preview-reconocimiento-img').removeAttribute('src'); // Cierra la conexión
+        document.getElementById('preview-reconocimiento').style.display = 'none';
+    }
+
+    // El reconocimiento corre sin ventana en el servidor: se detiene cancelando su trabajo
+    const detenerReconocimientoBtn = document.getElementById('detener-reconocimiento');
+    let reconocimientoJobId = null;
+
+    function mostrarDetener(jobId) {
+        reconocimientoJobId = jobId;
+        if (detenerReconocimientoBtn) detenerReconocimientoBtn.style.display = jobId ? '' : 'none';
+    }
+
+    function seguirReconocimiento(jobId) {
+        mostrarDetener(jobId);
+        seguirJob(jobId, 'Reconocimiento facial', () => {
+            cerrarVistaPrevia();
+            mostrarDetener(null);
+        });
+    }
+
+    async function detenerReconocimiento() {
+        if (!reconocimientoJobId) return;
+        try {
+            const response = await fetch(`/jobs/${reconocimientoJobId}/cancelar`, { method: 'POST' });
+            const data = await response.json();
+            if (!response.ok) {
+                alert('No se pudo detener el reconocimiento: ' + data.error);
+                mostrarDetener(null);
+            }
+            // Si se pudo, seguirJob informa el final y oculta el botón
+        } catch (error) {
+            console.error('Error en la solicitud:', error);
+            alert('Error en la comunicación con el servidor.');
+        }
+    }
+
     async function iniciarReconocimiento() {
         if (!confirm('¿Deseas iniciar el reconocimiento facial en tiempo real? Se abrirá la cámara.')) return;
         try {
@@ -364,6 +517,14 @@ document.addEventListener('DOMContentLoaded', () => {
             const data = await response.json();
             if (response.ok) {
                 alert(data.mensaje);
+                if (data.preview_url) mostrarVistaPrevia(data.preview_url);
+                seguirReconocimiento(data.job_id);
+            } else if (response.status === 409) {
+                alert('Ya hay un trabajo en curso que usa el mismo recurso: ' + data.error);
+                // Si es un reconocimiento propio que quedó corriendo (por ejemplo, tras recargar la
+                // página), ofrecer detenerlo; /jobs responde 404 para los trabajos de otros usuarios
+                const job = await fetch(`/jobs/${data.job_id}`);
+                if (job.ok && (await job.json()).tipo === 'reconocimiento') seguirReconocimiento(data.job_id);
             } else {
                 alert('Error al iniciar reconocimiento: ' + data.error);
             }
@@ -373,6 +534,13 @@ document.addEventListener('DOMContentLoaded', () => {
         }
     }
 
+    // Las funciones viven dentro de este bloque: los botones se conectan acá y no con onclick en el HTML
+    [['entrenar-reconocedor', entrenarReconocedor], ['iniciar-reconocimiento', iniciarReconocimiento],
+     ['detener-reconocimiento', detenerReconocimiento], ['cerrar-vista-previa', cerrarVistaPrevia]].forEach(([id, fn]) => {
+        const boton = document.getElementById(id);
+        if (boton) boton.addEventListener('click', () => fn());
+    });
+
     // Inicialización al cargar la página
     async function initApp() {
         currentUserRole = getCurrentUserRole(); // Re-obtener el rol por si ha cambiado
@@ -397,6 +565,7 @@ document.addEventListener('DOMContentLoaded', () => {
         if (document.querySelector('.user-info')) { // Solo si hay un usuario logueado
             cargarAlumnos();
             if (currentUserRole === 'preceptor') {
+                escucharAsistencias(); // Antes de cargar, para no perder lo que se registre mientras tanto
                 cargarAsistencias();
             }
             if (currentUserRole === 'admin') {